@@ -10,6 +10,36 @@ from dataclasses import dataclass, field
 from typing import Any, Iterable, Tuple
 
 
+# Strict JSON schema requested from the model for structured plan generation.
+# Strict mode rejects free-form objects, so each step carries its parameters
+# as a JSON-encoded object string that is decoded when the step is parsed.
+ACTION_PLAN_JSON_SCHEMA: dict[str, Any] = {
+    'type': 'object',
+    'properties': {
+        'summary': {'type': 'string'},
+        'steps': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'id': {'type': 'string'},
+                    'tool': {'type': 'string'},
+                    'description': {'type': 'string'},
+                    'parameters': {
+                        'type': 'string',
+                        'description': 'Tool parameters as a JSON-encoded object, e.g. {"status": "IN_PROGRESS"}'
+                    }
+                },
+                'required': ['id', 'tool', 'description', 'parameters'],
+                'additionalProperties': False
+            }
+        }
+    },
+    'required': ['summary', 'steps'],
+    'additionalProperties': False
+}
+
+
 def _validate_text(value: str, field_name: str) -> None:
     if not isinstance(value, str) or not value.strip():
         raise ValueError(f'{field_name} must be a non-empty string')
@@ -48,6 +78,20 @@ class ActionStep:
         _validate_text(self.description, 'description')
         _validate_json_value(self.parameters, 'parameters')
 
+    @classmethod
+    def from_dict(cls, data: Any) -> 'ActionStep':
+        if not isinstance(data, dict):
+            raise ValueError('step must be a JSON object')
+        parameters = data.get('parameters')
+        if not isinstance(parameters, dict):
+            raise ValueError('parameters must be a JSON object')
+        return cls(
+            step_id=data.get('id') or data.get('step_id'),
+            tool=data.get('tool'),
+            description=data.get('description'),
+            parameters=parameters
+        )
+
     def to_dict(self) -> dict:
         return {
             'id': self.step_id,
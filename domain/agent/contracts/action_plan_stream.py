@@ -0,0 +1,155 @@
+"""Incremental parser for streamed action plans.
+
+Consumes the JSON text of an ``ActionPlan`` chunk by chunk and yields each
+``ActionStep`` as soon as its object closes. Steps that fail validation and
+a truncated or malformed tail are recorded as errors instead of discarding
+the steps already parsed.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from .action_plan import ActionPlan, ActionStep
+
+
+class ActionPlanStreamParser:
+    """Streaming parser for ``{"summary": ..., "steps": [{...}, ...]}``."""
+
+    def __init__(self) -> None:
+        self.summary: str | None = None
+        self.steps: list[ActionStep] = []
+        self.errors: list[str] = []
+        self._text = ''
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._current_key: str | None = None
+        self._step_start: int | None = None
+        self._in_scalar_step = False
+        self._closed = False
+
+    @property
+    def complete(self) -> bool:
+        """True once the top-level object has been closed."""
+        return self._closed
+
+    def feed(self, chunk: str) -> list[ActionStep]:
+        """Consume ``chunk`` and return the steps completed by it."""
+        if not chunk or self._closed:
+            return []
+        self._text += chunk
+        completed: list[ActionStep] = []
+        text = self._text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string(text[self._string_start:index + 1])
+                continue
+            if not self._stack and char != '{':
+                # Skip any preamble such as a markdown code fence.
+                continue
+            if char == '"':
+                if self._in_steps_array():
+                    self._reject_step()
+                self._in_string = True
+                self._string_start = index
+            elif char in '{[':
+                if char == '[' and self._in_steps_array():
+                    self._reject_step()
+                self._stack.append(char)
+                if len(self._stack) == 1:
+                    self._expect_key = True
+                elif char == '{' and self._stack == ['{', '[', '{'] and self._current_key == 'steps':
+                    self._step_start = index
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._step_start is not None and self._stack == ['{', '[']:
+                    step = self._parse_step(text[self._step_start:index + 1])
+                    self._step_start = None
+                    if step is not None:
+                        self.steps.append(step)
+                        completed.append(step)
+                elif not self._stack:
+                    self._closed = True
+                    self._pos = index + 1
+                    return completed
+                self._in_scalar_step = False
+            elif self._in_steps_array():
+                # Numbers, booleans and null in "steps" are not objects either.
+                if char == ',':
+                    self._in_scalar_step = False
+                elif not char.isspace() and not self._in_scalar_step:
+                    self._in_scalar_step = True
+                    self._reject_step()
+            elif len(self._stack) == 1:
+                if char == ':':
+                    self._expect_key = False
+                elif char == ',':
+                    self._expect_key = True
+        self._pos = len(text)
+        return completed
+
+    def to_plan(self, ticket_id: int | None, default_summary: str, in_progress: bool = False) -> ActionPlan:
+        """Build an ``ActionPlan`` from everything parsed so far.
+
+        ``metadata.generation`` is ``in_progress`` while streaming, then
+        ``complete`` or ``partial`` (with ``metadata.errors``) at the end.
+        """
+        errors = list(self.errors)
+        if in_progress:
+            generation = 'in_progress'
+        else:
+            if not self._closed:
+                errors.append('stream ended before the plan was closed')
+            generation = 'partial' if errors else 'complete'
+        plan_metadata: dict[str, Any] = {'generation': generation}
+        if errors:
+            plan_metadata['errors'] = errors
+        return ActionPlan(
+            ticket_id=ticket_id,
+            summary=self.summary or default_summary,
+            steps=tuple(self.steps),
+            metadata=plan_metadata
+        )
+
+    def _on_string(self, raw: str) -> None:
+        if len(self._stack) != 1:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        if self._expect_key:
+            self._current_key = value
+        elif self._current_key == 'summary' and value.strip():
+            self.summary = value
+
+    def _in_steps_array(self) -> bool:
+        return self._stack == ['{', '['] and self._current_key == 'steps'
+
+    def _reject_step(self) -> None:
+        self.errors.append('invalid step: step must be a JSON object')
+
+    def _parse_step(self, raw: str) -> ActionStep | None:
+        try:
+            data = json.loads(raw)
+            # ACTION_PLAN_JSON_SCHEMA sends parameters as a JSON-encoded string.
+            if isinstance(data, dict) and isinstance(data.get('parameters'), str):
+                data['parameters'] = json.loads(data['parameters'])
+            return ActionStep.from_dict(data)
+        except ValueError as exc:
+            self.errors.append(f'invalid step: {exc}')
+            return None
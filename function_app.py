@@ -1,11 +1,28 @@
+import asyncio
 import azure.functions as func
+import json
 import logging
 
 from sophia_agent import main as sophia_main
+from sophia_agent.handler import sophia_agent
 from victor_agent import main as victor_main
+from victor_agent.handler import victor_agent
+from victor_agent.worker import process_ticket_event
+from shared import config
+from shared.events import TICKET_CREATED_QUEUE, parse_ticket_event, send_to_dead_letter
+from shared.hedging import get_hedge_stats
+from shared.metrics import get_mode_stats
+from shared.warmup import run_warmup, start_background_warmup
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
 
+# Settings and company overrides are loaded at startup instead of on the first request.
+config.get_settings()
+config.refresh_overrides(force=True)
+
+if config.get_warmup_on_start():
+    start_background_warmup()
+
 @app.route(route="agents/SophiaDurableAgent/run", methods=["POST"])
 async def sophia_agent_trigger(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Trigger de SOPHIA ejecutado desde function_app.py')
@@ -15,3 +32,42 @@ async def sophia_agent_trigger(req: func.HttpRequest) -> func.HttpResponse:
 async def victor_agent_trigger(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Trigger de VICTOR ejecutado desde function_app.py')
     return await victor_main(req)
+
+@app.queue_trigger(arg_name="msg", queue_name=TICKET_CREATED_QUEUE, connection="AzureWebJobsStorage")
+async def victor_ticket_created_worker(msg: func.QueueMessage) -> None:
+    body = msg.get_body().decode('utf-8', errors='replace')
+    try:
+        event = parse_ticket_event(body)
+    except ValueError as exc:
+        logging.error('Evento ticket.created invalido (%s); enviado a dead-letter', exc)
+        await asyncio.to_thread(send_to_dead_letter, body, str(exc))
+        return
+    result = await process_ticket_event(event)
+    logging.info('Worker de VICTOR proceso evento %s: %s', result['event_id'], result['outcome'])
+
+@app.route(route="agents/metrics", methods=["GET"])
+async def agents_metrics_trigger(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({'hedging': get_hedge_stats(), 'chat_modes': get_mode_stats()}),
+        status_code=200,
+        mimetype='application/json'
+    )
+
+@app.route(route="agents/warmup", methods=["POST"])
+async def agents_warmup_trigger(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Warm-up ejecutado desde function_app.py')
+    try:
+        payload = req.get_json()
+    except ValueError:
+        payload = {}
+    companies = payload.get('companies') if isinstance(payload, dict) else None
+    llm_agents = {} if config.get_settings().chat_mode == 'rules' else {'SOPHIA': sophia_agent, 'VICTOR': victor_agent}
+    report = await run_warmup(
+        agents=llm_agents,
+        companies=[str(item) for item in companies] if isinstance(companies, list) else None
+    )
+    return func.HttpResponse(
+        json.dumps(report),
+        status_code=200,
+        mimetype='application/json'
+    )
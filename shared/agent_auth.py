@@ -3,22 +3,21 @@
 from __future__ import annotations
 
 import time
-from typing import Optional
-
-import requests
 
 from shared import config
+from shared.backend_client import get_http_session
+from shared.tracing import inject_headers, start_span
 
 
-_cached_token: Optional[str] = None
-_token_expires_at: float = 0.0
+# (company_id, agent_type) -> (token, expires_at)
+_token_cache: dict[tuple[str, str], tuple[str, float]] = {}
 
 
 def get_agent_token(company_id: str, agent_type: str) -> str:
-    global _cached_token, _token_expires_at
-
-    if _cached_token and time.time() < _token_expires_at:
-        return _cached_token
+    cache_key = (str(company_id), agent_type)
+    cached = _token_cache.get(cache_key)
+    if cached and time.time() < cached[1]:
+        return cached[0]
 
     access_key = config.get_agent_access_key()
     if not access_key:
@@ -35,9 +34,23 @@ def get_agent_token(company_id: str, agent_type: str) -> str:
     data: dict | None = None
     for attempt in range(3):
         try:
-            response = requests.post(url, json=payload, timeout=config.get_backend_timeout())
-            response.raise_for_status()
-            data = response.json()
+            with start_span(
+                'backend POST agent token',
+                kind='client',
+                http__request__method='POST',
+                url__full=url,
+                agent__company_id=str(company_id),
+                agent__type=agent_type,
+                agent__auth_attempt=attempt
+            ):
+                response = get_http_session().post(
+                    url,
+                    json=payload,
+                    headers=inject_headers({}),
+                    timeout=config.for_company(company_id).backend_timeout
+                )
+                response.raise_for_status()
+                data = response.json()
             last_error = None
             break
         except Exception as exc:
@@ -55,6 +68,5 @@ def get_agent_token(company_id: str, agent_type: str) -> str:
         raise ValueError('Backend did not return access_token')
 
     expires_in = data.get('expires_in', 3600)
-    _cached_token = token
-    _token_expires_at = time.time() + max(int(expires_in) - 30, 0)
+    _token_cache[cache_key] = (token, time.time() + max(int(expires_in) - 30, 0))
     return token
@@ -1,37 +1,103 @@
 """Local chat client for Agent Framework integration."""
 
-from typing import Any
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterable
+
+from agent_framework import BaseChatClient, ChatMessage, ChatResponse, ChatResponseUpdate
+
+from shared.config import DEFAULT_CLASSIFIER_KEYWORDS
+
+
+_THREADS_MAX = 1024
+
+# Conversation history per caller thread id, kept in memory on this instance.
+_threads: OrderedDict[tuple[str, str], Any] = OrderedDict()
+_threads_lock = threading.Lock()
 
 
 class RuleBasedChatClient:
     """Deterministic chat client for local durable agents."""
 
-    def __init__(self, agent_name: str) -> None:
+    def __init__(self, agent_name: str, keywords: tuple[str, ...] = DEFAULT_CLASSIFIER_KEYWORDS) -> None:
         self.agent_name = agent_name
+        self.keywords = keywords
 
-    def complete(self, messages: list[dict[str, Any]], **kwargs: Any) -> dict:
+    def complete(self, messages: list[Any], **kwargs: Any) -> dict:
         last_message = _last_user_message(messages)
         if self.agent_name.upper() == 'SOPHIA':
-            classification = _classify_message(last_message)
+            classification, _ = classify_message(last_message, self.keywords)
             text = _build_sophia_text(classification)
         else:
             text = 'VICTOR listo para generar un plan de accion.'
         return {'content': text}
 
 
-def _last_user_message(messages: list[dict[str, Any]]) -> str:
-    for message in reversed(messages):
-        if message.get('role') == 'user':
-            return str(message.get('content') or '')
-    return ''
+class RuleBasedAgentChatClient(BaseChatClient):
+    """Agent Framework chat client that answers with ``RuleBasedChatClient``.
+
+    Lets a framework agent run fully locally, without an LLM round trip.
+    """
+
+    def __init__(self, agent_name: str, keywords: tuple[str, ...] = DEFAULT_CLASSIFIER_KEYWORDS, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.rules = RuleBasedChatClient(agent_name, keywords)
+
+    async def _inner_get_response(self, *, messages: Any, **kwargs: Any) -> ChatResponse:
+        text = self.rules.complete(list(messages))['content']
+        return ChatResponse(messages=ChatMessage(role='assistant', text=text))
+
+    async def _inner_get_streaming_response(self, *, messages: Any, **kwargs: Any) -> AsyncIterable[ChatResponseUpdate]:
+        text = self.rules.complete(list(messages))['content']
+        yield ChatResponseUpdate(role='assistant', text=text)
 
 
-def _classify_message(message: str) -> str:
+def classify_message(message: str, keywords: tuple[str, ...] = DEFAULT_CLASSIFIER_KEYWORDS) -> tuple[str, float]:
+    """Classify ``message`` and return ``(classification, confidence)``.
+
+    Confidence grows with the number of distinct keywords matched; keywords
+    contained in a longer matched keyword ('auto' in 'automated') count once.
+    """
     normalized = (message or '').lower()
-    keywords = ('automated', 'auto', 'runbook', 'playbook', 'block', 'isolate', 'disable', 'quarantine')
-    if any(keyword in normalized for keyword in keywords):
-        return 'AUTOMATED'
-    return 'MANUAL'
+    matched = [keyword for keyword in keywords if keyword in normalized]
+    matched = [keyword for keyword in matched if not any(keyword != other and keyword in other for other in matched)]
+    if not matched:
+        return 'MANUAL', 0.6
+    if len(matched) == 1:
+        return 'AUTOMATED', 0.7
+    return 'AUTOMATED', 0.9
+
+
+def get_agent_thread(agent: Any, thread_id: str | None):
+    """Return the ``AgentThread`` for ``thread_id``, or None when there is none.
+
+    Chat completion deployments have no service-side threads, so the caller's
+    thread id maps to a local thread; the least recently used are evicted.
+    """
+    if not thread_id or not hasattr(agent, 'get_new_thread'):
+        return None
+    key = (str(getattr(agent, 'name', '')), str(thread_id))
+    with _threads_lock:
+        thread = _threads.get(key)
+        if thread is None:
+            thread = agent.get_new_thread()
+            _threads[key] = thread
+            while len(_threads) > _THREADS_MAX:
+                _threads.popitem(last=False)
+        else:
+            _threads.move_to_end(key)
+    return thread
+
+
+def _last_user_message(messages: list[Any]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, dict):
+            role, content = message.get('role'), message.get('content')
+        else:
+            role, content = getattr(message, 'role', None), getattr(message, 'text', None)
+        if str(getattr(role, 'value', role)) == 'user':
+            return str(content or '')
+    return ''
 
 
 def _build_sophia_text(classification: str) -> str:
@@ -1,9 +1,42 @@
 """HTTP client for backend access."""
 
+import http.cookiejar
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 import requests
+from requests.adapters import HTTPAdapter
 
 from shared import config
+from shared.hedging import HEDGE_EXECUTOR_WORKERS, get_policy
+from shared.tracing import inject_headers, start_span
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide session so backend connections are pooled and reused.
+
+    The session is shared by every company, so it never stores cookies such
+    as ARRAffinity that would leak across tenants and pin all traffic to one
+    backend instance. The pool keeps the warmed connections plus one per
+    concurrent caller thread and hedge.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                pool_size = max(config.get_warmup_backend_connections() + HEDGE_EXECUTOR_WORKERS, 10)
+                adapter = HTTPAdapter(pool_maxsize=pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
 
 
 class BackendClient:
@@ -27,12 +60,17 @@ class BackendClient:
         )
 
     def ticket_get(self, company_id: str, ticket_id: int, auth_header: Optional[str] = None) -> dict:
-        return self._request(
-            'get',
-            f'/tickets/{ticket_id}',
-            company_id=company_id,
-            auth_header=auth_header
-        )
+        def fetch() -> dict:
+            return self._request(
+                'get',
+                f'/tickets/{ticket_id}',
+                company_id=company_id,
+                auth_header=auth_header
+            )
+
+        if config.get_backend_hedge_enabled():
+            return get_policy('ticket_get').execute(fetch)
+        return fetch()
 
     def ticket_patch(self, company_id: str, ticket_id: int, patch: dict, auth_header: Optional[str] = None) -> dict:
         return self._request(
@@ -43,6 +81,22 @@ class BackendClient:
             auth_header=auth_header
         )
 
+    def warm_up(self, connections: int = 1) -> int:
+        """Open ``connections`` pooled connections to the backend (DNS + TLS).
+
+        Any HTTP status counts as success; only transport errors are raised.
+        """
+        session = get_http_session()
+        count = max(connections, 1)
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            responses = list(executor.map(
+                lambda _: session.head(self.base_url, timeout=self.timeout, allow_redirects=False),
+                range(count)
+            ))
+        for response in responses:
+            response.close()
+        return len(responses)
+
     def _request(
         self,
         method: str,
@@ -52,18 +106,28 @@ class BackendClient:
         auth_header: Optional[str] = None
     ) -> dict:
         url = f'{self.base_url}{path}'
-        headers: dict[str, Any] = {
-            config.get_company_header_name(): str(company_id)
-        }
-        if auth_header:
-            headers['Authorization'] = auth_header
-
-        response = requests.request(
-            method=method,
-            url=url,
-            json=json,
-            headers=headers,
-            timeout=self.timeout
-        )
-        response.raise_for_status()
-        return response.json()
+        with start_span(
+            f'backend {method.upper()}',
+            kind='client',
+            http__request__method=method.upper(),
+            url__full=url,
+            agent__company_id=str(company_id)
+        ) as span:
+            headers: dict[str, Any] = {
+                config.get_company_header_name(): str(company_id)
+            }
+            if auth_header:
+                headers['Authorization'] = auth_header
+            inject_headers(headers)
+
+            response = get_http_session().request(
+                method=method,
+                url=url,
+                json=json,
+                headers=headers,
+                timeout=self.timeout
+            )
+            if span is not None:
+                span.set_attribute('http.response.status_code', response.status_code)
+            response.raise_for_status()
+            return response.json()
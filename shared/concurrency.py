@@ -0,0 +1,27 @@
+"""Per-company concurrency limits for agent handlers."""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+
+
+_in_flight: defaultdict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def try_acquire(company_id: str, limit: int) -> bool:
+    """Reserve a request slot for ``company_id``; ``limit`` 0 means unlimited."""
+    with _lock:
+        if limit > 0 and _in_flight[company_id] >= limit:
+            return False
+        _in_flight[company_id] += 1
+        return True
+
+
+def release(company_id: str) -> None:
+    with _lock:
+        if _in_flight[company_id] <= 1:
+            _in_flight.pop(company_id, None)
+        else:
+            _in_flight[company_id] -= 1
@@ -1,30 +1,434 @@
-"""Shared configuration for Azure Functions agents."""
+"""Shared configuration for Azure Functions agents.
 
+Environment settings are parsed and validated once into an immutable
+``Settings`` snapshot. Per-company overrides (backend timeout, classifier
+keywords, concurrency limit, LLM deployment, chat mode) are loaded from a local JSON
+file or a backend endpoint, cached with a TTL and swapped atomically on
+reload. Expired overrides are reloaded in a background thread while callers
+keep reading the previous snapshot. Hot paths read a pre-resolved
+``TenantSettings`` view through ``for_company``.
+
+Override document shape (file or endpoint)::
+
+    {"companies": {"42": {"backend_timeout": 5, "classifier_keywords": ["block"],
+                          "max_concurrent_requests": 4, "llm_deployment": "gpt-4o-mini",
+                          "chat_mode": "hybrid"}}}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
 import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODES = ('llm', 'rules', 'hybrid')
+DEFAULT_CLASSIFIER_KEYWORDS = ('automated', 'auto', 'runbook', 'playbook', 'block', 'isolate', 'disable', 'quarantine')
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes')
+
+
+def _env_number(name: str, default: Any, cast: Callable[[str], Any]) -> Any:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning('Invalid value for %s: %r; using %r', name, value, default)
+        return default
+
+
+def _env_list(name: str, default: tuple[str, ...] = ()) -> tuple[str, ...]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def _env_chat_mode() -> str:
+    value = os.getenv('CHAT_MODE', 'llm').strip().lower()
+    if value not in CHAT_MODES:
+        logger.warning('Invalid value for CHAT_MODE: %r; using %r', value, 'llm')
+        return 'llm'
+    return value
+
+
+@dataclass(frozen=True)
+class TenantSettings:
+    """Settings for one company with its overrides already applied."""
+
+    company_id: str
+    backend_timeout: int
+    classifier_keywords: tuple[str, ...]
+    max_concurrent_requests: int
+    llm_deployment: str | None
+    chat_mode: str = 'llm'
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Immutable snapshot of the environment configuration."""
+
+    backend_url: str | None
+    backend_timeout: int = 10
+    company_header: str = 'X-Company-Id'
+    agent_access_key: str | None = None
+    agent_type: str | None = None
+    llm_deployment: str | None = None
+    chat_mode: str = 'llm'
+    hybrid_confidence_threshold: float = 0.8
+    classifier_keywords: tuple[str, ...] = DEFAULT_CLASSIFIER_KEYWORDS
+    max_concurrent_requests: int = 0
+    overrides_file: str | None = None
+    overrides_url: str | None = None
+    overrides_ttl_seconds: int = 60
+    hedge_enabled: bool = False
+    hedge_percentile: float = 0.9
+    hedge_budget_percent: float = 5.0
+    hedge_min_delay_ms: int = 50
+    profiling_enabled: bool = False
+    profiling_header: str = 'X-Profile-Request'
+    profiling_token: str | None = None
+    profiling_sample_rate: float = 0.0
+    profiling_output_dir: str = field(default_factory=lambda: os.path.join(tempfile.gettempdir(), 'agent-profiles'))
+    profiling_top_n: int = 25
+    warmup_companies: tuple[str, ...] = ()
+    warmup_on_start: bool = False
+    warmup_backend_connections: int = 4
+    ticket_events_enabled: bool = False
+    events_connection: str | None = None
+    worker_concurrency: int = 4
+    plan_patch_interval_seconds: float = 1.0
+    tracing_enabled: bool = False
+    tracing_sample_ratio: float = 1.0
+    tracing_exporter: str = 'otlp'
+    tracing_file_path: str = field(default_factory=lambda: os.path.join(tempfile.gettempdir(), 'agent-spans.jsonl'))
+    tracing_service_name: str = 'xoc-agents'
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        backend_url = os.getenv('BACKEND_URL')
+        keywords = tuple(keyword.lower() for keyword in _env_list('CLASSIFIER_KEYWORDS', DEFAULT_CLASSIFIER_KEYWORDS))
+        return cls(
+            backend_url=backend_url.rstrip('/') if backend_url else None,
+            backend_timeout=_env_number('BACKEND_TIMEOUT_SECONDS', 10, int),
+            company_header=os.getenv('XCOMPANY_HEADER', 'X-Company-Id'),
+            agent_access_key=os.getenv('AGENT_ACCESS_KEY'),
+            agent_type=os.getenv('AGENT_TYPE'),
+            llm_deployment=os.getenv('AZURE_OPENAI_DEPLOYMENT'),
+            chat_mode=_env_chat_mode(),
+            hybrid_confidence_threshold=_env_number('HYBRID_CONFIDENCE_THRESHOLD', 0.8, float),
+            classifier_keywords=keywords,
+            max_concurrent_requests=max(_env_number('MAX_CONCURRENT_REQUESTS', 0, int), 0),
+            overrides_file=os.getenv('COMPANY_OVERRIDES_FILE') or None,
+            overrides_url=os.getenv('COMPANY_OVERRIDES_URL') or None,
+            overrides_ttl_seconds=max(_env_number('COMPANY_OVERRIDES_TTL_SECONDS', 60, int), 1),
+            hedge_enabled=_env_bool('BACKEND_HEDGE_ENABLED', False),
+            hedge_percentile=_env_number('BACKEND_HEDGE_PERCENTILE', 0.9, float),
+            hedge_budget_percent=_env_number('BACKEND_HEDGE_BUDGET_PERCENT', 5.0, float),
+            hedge_min_delay_ms=_env_number('BACKEND_HEDGE_MIN_DELAY_MS', 50, int),
+            profiling_enabled=_env_bool('PROFILING_ENABLED', False),
+            profiling_header=os.getenv('PROFILING_HEADER', 'X-Profile-Request'),
+            profiling_token=os.getenv('PROFILING_TOKEN') or None,
+            profiling_sample_rate=min(max(_env_number('PROFILING_SAMPLE_RATE', 0.0, float), 0.0), 1.0),
+            profiling_output_dir=os.getenv('PROFILING_OUTPUT_DIR') or os.path.join(tempfile.gettempdir(), 'agent-profiles'),
+            profiling_top_n=_env_number('PROFILING_TOP_N', 25, int),
+            warmup_companies=_env_list('WARMUP_COMPANIES'),
+            warmup_on_start=_env_bool('WARMUP_ON_START', False),
+            warmup_backend_connections=_env_number('WARMUP_BACKEND_CONNECTIONS', 4, int),
+            ticket_events_enabled=_env_bool('TICKET_EVENTS_ENABLED', False),
+            events_connection=os.getenv('AzureWebJobsStorage') or None,
+            worker_concurrency=max(_env_number('VICTOR_WORKER_CONCURRENCY', 4, int), 1),
+            plan_patch_interval_seconds=max(_env_number('VICTOR_PLAN_PATCH_INTERVAL_SECONDS', 1.0, float), 0.0),
+            tracing_enabled=_env_bool('TRACING_ENABLED', False),
+            tracing_sample_ratio=min(max(_env_number('TRACING_SAMPLE_RATIO', 1.0, float), 0.0), 1.0),
+            tracing_exporter='file' if os.getenv('TRACING_EXPORTER', 'otlp').strip().lower() == 'file' else 'otlp',
+            tracing_file_path=os.getenv('TRACING_FILE_PATH') or os.path.join(tempfile.gettempdir(), 'agent-spans.jsonl'),
+            tracing_service_name=os.getenv('OTEL_SERVICE_NAME', 'xoc-agents')
+        )
+
+    def tenant_defaults(self, company_id: str) -> TenantSettings:
+        return TenantSettings(
+            company_id=company_id,
+            backend_timeout=self.backend_timeout,
+            classifier_keywords=self.classifier_keywords,
+            max_concurrent_requests=self.max_concurrent_requests,
+            llm_deployment=self.llm_deployment,
+            chat_mode=self.chat_mode
+        )
+
+
+@dataclass(frozen=True)
+class _OverrideState:
+    overrides: dict[str, dict[str, Any]]
+    views: dict[str, TenantSettings]
+    loaded_at: float
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+_override_state = _OverrideState(overrides={}, views={}, loaded_at=float('-inf'))
+_override_lock = threading.Lock()
+_refresh_thread: Optional[threading.Thread] = None
+_refresh_thread_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    global _settings
+
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """Re-read the environment and drop cached overrides."""
+    global _settings, _override_state
+
+    with _settings_lock:
+        _settings = Settings.from_env()
+    _override_state = _OverrideState(overrides={}, views={}, loaded_at=float('-inf'))
+    return _settings
+
+
+def for_company(company_id: str | int | None) -> TenantSettings:
+    """Return the resolved settings view for ``company_id``.
+
+    Never blocks on a reload: an expired snapshot keeps being served while
+    a background thread fetches the new one.
+    """
+    settings = get_settings()
+    key = str(company_id) if company_id is not None else ''
+    state = _override_state
+    if (settings.overrides_file or settings.overrides_url) and time.monotonic() - state.loaded_at > settings.overrides_ttl_seconds:
+        _start_background_refresh()
+
+    override = state.overrides.get(key)
+    if override is None:
+        # Not cached, so unknown company ids cannot grow the view cache.
+        return settings.tenant_defaults(key)
+    view = state.views.get(key)
+    if view is None:
+        view = _resolve(settings, key, override)
+        state.views[key] = view
+    return view
+
+
+def refresh_overrides(force: bool = False) -> _OverrideState:
+    """Reload company overrides and swap them in as a single reference.
+
+    Only one caller reloads at a time; concurrent callers keep reading the
+    previous state. A failed load keeps the previous overrides until the
+    next TTL expiry.
+    """
+    global _override_state
+
+    if not _override_lock.acquire(blocking=force):
+        return _override_state
+    try:
+        settings = get_settings()
+        state = _override_state
+        if not force and time.monotonic() - state.loaded_at <= settings.overrides_ttl_seconds:
+            return state
+        try:
+            overrides = _load_overrides(settings)
+        except Exception as exc:
+            logger.warning('Failed to load company overrides: %s', exc)
+            overrides = state.overrides
+        _override_state = _OverrideState(overrides=overrides, views={}, loaded_at=time.monotonic())
+        return _override_state
+    finally:
+        _override_lock.release()
+
+
+def _start_background_refresh() -> None:
+    global _refresh_thread
+
+    with _refresh_thread_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=refresh_overrides, name='company-overrides-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+def _load_overrides(settings: Settings) -> dict[str, dict[str, Any]]:
+    if settings.overrides_file:
+        with open(settings.overrides_file, encoding='utf-8') as handle:
+            document = json.load(handle)
+    elif settings.overrides_url:
+        from shared.backend_client import get_http_session
+
+        response = get_http_session().get(settings.overrides_url, timeout=settings.backend_timeout)
+        response.raise_for_status()
+        document = response.json()
+    else:
+        return {}
+
+    if isinstance(document, dict) and isinstance(document.get('companies'), dict):
+        document = document['companies']
+    if not isinstance(document, dict):
+        raise ValueError('Company overrides must be a JSON object keyed by company id')
+    return {str(company_id): values for company_id, values in document.items() if isinstance(values, dict)}
+
+
+def _resolve(settings: Settings, company_id: str, override: dict[str, Any] | None) -> TenantSettings:
+    view = settings.tenant_defaults(company_id)
+    if not override:
+        return view
+
+    changes: dict[str, Any] = {}
+    for key, value in override.items():
+        parser = _OVERRIDE_PARSERS.get(key)
+        if parser is None:
+            logger.warning('Ignoring unknown override %s for company %s', key, company_id)
+            continue
+        try:
+            changes[key] = parser(value)
+        except (TypeError, ValueError) as exc:
+            logger.warning('Ignoring invalid override %s for company %s: %s', key, company_id, exc)
+    return replace(view, **changes)
+
+
+def _parse_positive_int(value: Any) -> int:
+    if isinstance(value, bool) or int(value) <= 0:
+        raise ValueError('must be a positive integer')
+    return int(value)
+
+
+def _parse_non_negative_int(value: Any) -> int:
+    if isinstance(value, bool) or int(value) < 0:
+        raise ValueError('must be a non-negative integer')
+    return int(value)
+
+
+def _parse_keywords(value: Any) -> tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) and item.strip() for item in value):
+        raise ValueError('must be a list of non-empty strings')
+    return tuple(item.strip().lower() for item in value)
+
+
+def _parse_text(value: Any) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('must be a non-empty string')
+    return value.strip()
+
+
+def _parse_chat_mode(value: Any) -> str:
+    if not isinstance(value, str) or value.strip().lower() not in CHAT_MODES:
+        raise ValueError(f"must be one of {', '.join(CHAT_MODES)}")
+    return value.strip().lower()
+
+
+_OVERRIDE_PARSERS: dict[str, Callable[[Any], Any]] = {
+    'backend_timeout': _parse_positive_int,
+    'classifier_keywords': _parse_keywords,
+    'max_concurrent_requests': _parse_non_negative_int,
+    'llm_deployment': _parse_text,
+    'chat_mode': _parse_chat_mode
+}
 
 
 def get_backend_url() -> str:
-    backend_url = os.getenv('BACKEND_URL')
+    backend_url = get_settings().backend_url
     if not backend_url:
         raise ValueError('BACKEND_URL is required')
-    return backend_url.rstrip('/')
+    return backend_url
 
 
 def get_backend_timeout() -> int:
-    value = os.getenv('BACKEND_TIMEOUT_SECONDS', '10')
-    try:
-        return int(value)
-    except ValueError:
-        return 10
+    return get_settings().backend_timeout
 
 
 def get_company_header_name() -> str:
-    return os.getenv('XCOMPANY_HEADER', 'X-Company-Id')
+    return get_settings().company_header
 
 
 def get_agent_access_key() -> str | None:
-    return os.getenv('AGENT_ACCESS_KEY')
+    return get_settings().agent_access_key
 
 
 def get_agent_type(default_type: str) -> str:
-    return os.getenv('AGENT_TYPE', default_type)
+    return get_settings().agent_type or default_type
+
+
+def get_backend_hedge_enabled() -> bool:
+    return get_settings().hedge_enabled
+
+
+def get_backend_hedge_percentile() -> float:
+    return get_settings().hedge_percentile
+
+
+def get_backend_hedge_budget_percent() -> float:
+    return get_settings().hedge_budget_percent
+
+
+def get_backend_hedge_min_delay_ms() -> int:
+    return get_settings().hedge_min_delay_ms
+
+
+def get_profiling_enabled() -> bool:
+    return get_settings().profiling_enabled
+
+
+def get_profiling_header_name() -> str:
+    return get_settings().profiling_header
+
+
+def get_profiling_token() -> str | None:
+    return get_settings().profiling_token
+
+
+def get_profiling_sample_rate() -> float:
+    return get_settings().profiling_sample_rate
+
+
+def get_profiling_output_dir() -> str:
+    return get_settings().profiling_output_dir
+
+
+def get_profiling_top_n() -> int:
+    return get_settings().profiling_top_n
+
+
+def get_warmup_companies() -> list[str]:
+    return list(get_settings().warmup_companies)
+
+
+def get_warmup_on_start() -> bool:
+    return get_settings().warmup_on_start
+
+
+def get_warmup_backend_connections() -> int:
+    return get_settings().warmup_backend_connections
+
+
+def get_ticket_events_enabled() -> bool:
+    return get_settings().ticket_events_enabled
+
+
+def get_worker_concurrency() -> int:
+    return get_settings().worker_concurrency
+
+
+def get_plan_patch_interval_seconds() -> float:
+    return get_settings().plan_patch_interval_seconds
+
+
+def get_hybrid_confidence_threshold() -> float:
+    return get_settings().hybrid_confidence_threshold
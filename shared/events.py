@@ -0,0 +1,99 @@
+"""Ticket events exchanged between SOPHIA and VICTOR over a storage queue.
+
+SOPHIA publishes a ``ticket.created`` event for every AUTOMATED ticket and a
+queue-triggered VICTOR worker pre-computes its action plan. Messages that
+keep failing are moved by the Functions host to ``<queue>-poison``, which
+also receives malformed events directly, so it acts as the dead-letter queue.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from shared import config
+from shared.tracing import inject_headers
+
+
+logger = logging.getLogger(__name__)
+
+TICKET_CREATED_QUEUE = 'ticket-created'
+TICKET_CREATED_DEAD_LETTER_QUEUE = f'{TICKET_CREATED_QUEUE}-poison'
+TICKET_CREATED_EVENT = 'ticket.created'
+
+_queue_clients: dict[str, Any] = {}
+_queue_clients_lock = threading.Lock()
+
+
+def build_ticket_created_event(company_id: str, ticket_id: int, classification: str, thread_id: str | None = None) -> dict:
+    return {
+        'event_id': str(uuid.uuid4()),
+        'type': TICKET_CREATED_EVENT,
+        'company_id': str(company_id),
+        'ticket_id': int(ticket_id),
+        'classification': classification,
+        'thread_id': thread_id,
+        'created_at': time.time(),
+        'trace_context': inject_headers({})
+    }
+
+
+def parse_ticket_event(body: str | bytes) -> dict:
+    """Decode and validate a queue message; raises ValueError when malformed."""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        event = json.loads(body)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f'event is not valid JSON: {exc}') from exc
+    if not isinstance(event, dict):
+        raise ValueError('event must be a JSON object')
+    if event.get('type') != TICKET_CREATED_EVENT:
+        raise ValueError(f"unsupported event type: {event.get('type')!r}")
+    if not isinstance(event.get('event_id'), str) or not event['event_id']:
+        raise ValueError('event_id must be a non-empty string')
+    if not isinstance(event.get('company_id'), str) or not event['company_id']:
+        raise ValueError('company_id must be a non-empty string')
+    if isinstance(event.get('ticket_id'), bool) or not isinstance(event.get('ticket_id'), int):
+        raise ValueError('ticket_id must be an integer')
+    return event
+
+
+def publish_ticket_created(event: dict) -> None:
+    _get_queue_client(TICKET_CREATED_QUEUE).send_message(json.dumps(event))
+
+
+def send_to_dead_letter(body: str, reason: str) -> None:
+    payload = json.dumps({'reason': reason, 'body': body, 'failed_at': time.time()})
+    _get_queue_client(TICKET_CREATED_DEAD_LETTER_QUEUE).send_message(payload)
+
+
+def _get_queue_client(queue_name: str):
+    client: Optional[Any] = _queue_clients.get(queue_name)
+    if client is not None:
+        return client
+    with _queue_clients_lock:
+        client = _queue_clients.get(queue_name)
+        if client is None:
+            from azure.core.exceptions import ResourceExistsError
+            from azure.storage.queue import QueueClient, TextBase64EncodePolicy
+
+            connection_string = config.get_settings().events_connection
+            if not connection_string:
+                raise ValueError('AzureWebJobsStorage is required to publish ticket events')
+            # The Functions queue trigger expects base64-encoded messages.
+            client = QueueClient.from_connection_string(
+                connection_string,
+                queue_name,
+                message_encode_policy=TextBase64EncodePolicy()
+            )
+            try:
+                client.create_queue()
+            except ResourceExistsError:
+                pass
+            _queue_clients[queue_name] = client
+        return client
@@ -0,0 +1,173 @@
+"""Hedged execution for idempotent backend reads.
+
+A hedge is a second, identical request sent when the first one has not
+returned after an adaptive delay (a latency percentile of recent calls).
+The first successful response wins. A budget caps hedges to a percentage
+of all requests so a slow backend is not hit with double the load.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+from shared import config
+
+
+T = TypeVar('T')
+
+# Blocking backend calls are issued from asyncio.to_thread, whose default pool
+# has this many workers; the hedge pool leaves room for a hedge per primary so
+# primaries never queue behind it.
+CALLER_CONCURRENCY = min(32, (os.cpu_count() or 1) + 4)
+HEDGE_EXECUTOR_WORKERS = 2 * CALLER_CONCURRENCY
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_policies: dict[str, 'HedgingPolicy'] = {}
+_policies_lock = threading.Lock()
+
+
+class HedgingPolicy:
+    """Adaptive hedging policy with a request budget and counters."""
+
+    def __init__(
+        self,
+        percentile: float = 0.9,
+        budget_percent: float = 5.0,
+        min_delay: float = 0.05,
+        window_size: int = 200,
+        min_samples: int = 20
+    ) -> None:
+        self.percentile = min(max(percentile, 0.0), 1.0)
+        self.budget_percent = max(budget_percent, 0.0)
+        self.min_delay = max(min_delay, 0.0)
+        self.min_samples = max(min_samples, 1)
+        self._latencies: deque[float] = deque(maxlen=max(window_size, 1))
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges_fired = 0
+        self._hedges_won = 0
+        self._hedges_denied = 0
+
+    def delay(self) -> Optional[float]:
+        """Return the hedge delay in seconds, or None while still learning."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            samples = sorted(self._latencies)
+        index = min(int(len(samples) * self.percentile), len(samples) - 1)
+        return max(samples[index], self.min_delay)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'hedges_fired': self._hedges_fired,
+                'hedges_won': self._hedges_won,
+                'hedges_denied_by_budget': self._hedges_denied,
+                'samples': len(self._latencies)
+            }
+
+    def execute(self, fn: Callable[[], T]) -> T:
+        """Run ``fn`` and hedge it once if it is slower than the threshold.
+
+        ``fn`` must be idempotent. It runs on the caller's thread while the
+        policy is learning or has no budget left, since no hedge could be
+        sent. A hedge that loses is cancelled if it has not started yet;
+        otherwise its result is discarded when it finishes, since a blocking
+        HTTP call cannot be interrupted mid-flight.
+        """
+        with self._lock:
+            self._requests += 1
+            has_budget = (self._hedges_fired + 1) * 100 <= self.budget_percent * self._requests
+        threshold = self.delay()
+        if threshold is None or not has_budget:
+            return self._timed(fn)
+
+        executor = _get_executor()
+        started = threading.Event()
+        # Copy the context so tracing spans started in the worker stay in the trace.
+        primary = executor.submit(contextvars.copy_context().run, self._timed, fn, started)
+
+        # The threshold counts from when fn starts, not from when it was queued.
+        started.wait()
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._acquire_hedge():
+            return primary.result()
+
+        hedge = executor.submit(contextvars.copy_context().run, self._timed, fn)
+        pending = {primary, hedge}
+        last_error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    last_error = error
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if future is hedge:
+                    with self._lock:
+                        self._hedges_won += 1
+                return future.result()
+        raise last_error
+
+    def _acquire_hedge(self) -> bool:
+        with self._lock:
+            allowed = (self._hedges_fired + 1) * 100 <= self.budget_percent * self._requests
+            if allowed:
+                self._hedges_fired += 1
+            else:
+                self._hedges_denied += 1
+            return allowed
+
+    def _timed(self, fn: Callable[[], T], started_event: Optional[threading.Event] = None) -> T:
+        if started_event is not None:
+            started_event.set()
+        started = time.perf_counter()
+        result = fn()
+        self.record(time.perf_counter() - started)
+        return result
+
+
+def get_policy(name: str) -> HedgingPolicy:
+    policy = _policies.get(name)
+    if policy is not None:
+        return policy
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = HedgingPolicy(
+                percentile=config.get_backend_hedge_percentile(),
+                budget_percent=config.get_backend_hedge_budget_percent(),
+                min_delay=config.get_backend_hedge_min_delay_ms() / 1000.0
+            )
+            _policies[name] = policy
+        return policy
+
+
+def get_hedge_stats() -> dict:
+    with _policies_lock:
+        return {name: policy.stats() for name, policy in _policies.items()}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_EXECUTOR_WORKERS, thread_name_prefix='backend-hedge')
+    return _executor
+
@@ -0,0 +1,50 @@
+"""In-process latency and throughput counters per agent and chat mode."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+
+_WINDOW_SIZE = 1000
+
+_lock = threading.Lock()
+# (agent, mode) -> {'count', 'total', 'first_seen', 'samples'}
+_series: dict[tuple[str, str], dict] = {}
+
+
+def record_agent_latency(agent_name: str, mode: str, seconds: float) -> None:
+    with _lock:
+        series = _series.get((agent_name, mode))
+        if series is None:
+            series = {'count': 0, 'total': 0.0, 'first_seen': time.monotonic(), 'samples': deque(maxlen=_WINDOW_SIZE)}
+            _series[(agent_name, mode)] = series
+        series['count'] += 1
+        series['total'] += seconds
+        series['samples'].append(seconds)
+
+
+def get_mode_stats() -> dict:
+    """Return per-agent, per-mode request counts, throughput and latency percentiles."""
+    now = time.monotonic()
+    report: dict[str, dict] = {}
+    with _lock:
+        snapshot = [(key, dict(series, samples=sorted(series['samples']))) for key, series in _series.items()]
+    for (agent_name, mode), series in snapshot:
+        samples = series['samples']
+        elapsed = max(now - series['first_seen'], 1e-9)
+        report.setdefault(agent_name, {})[mode] = {
+            'count': series['count'],
+            'throughput_rps': round(series['count'] / elapsed, 3),
+            'avg_ms': round(series['total'] / series['count'] * 1000, 3),
+            'p50_ms': round(_percentile(samples, 0.5) * 1000, 3),
+            'p99_ms': round(_percentile(samples, 0.99) * 1000, 3)
+        }
+    return report
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
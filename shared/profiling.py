@@ -0,0 +1,267 @@
+"""Opt-in per-request profiling for agent handlers.
+
+A request is profiled when profiling is enabled and either carries the
+authorized profiling header or is picked by the sampling rate. Profiled
+requests run under cProfile and tracemalloc and leave two files in the
+output directory. cProfile hooks the event-loop thread, so a profile covers
+everything that loop ran while the request was in flight, including other
+requests' coroutines; work sent to worker threads is not captured. Treat a
+profile as a sample of the worker loop during that request, not as an exact
+per-request cost:
+
+- ``<agent>_<company>_<thread>_<ts>.collapsed``: collapsed stacks (microseconds)
+- ``<agent>_<company>_<thread>_<ts>.alloc.txt``: top allocation sites
+
+Aggregate captured profiles into a single flame-graph-ready file with::
+
+    python -m shared.profiling <output_dir> [-o merged.collapsed] [--company 42]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from shared import config
+
+
+logger = logging.getLogger(__name__)
+
+# cProfile and tracemalloc hook the interpreter globally, so only one request
+# is profiled at a time; concurrent candidates are skipped.
+_active_lock = threading.Lock()
+
+_MAX_STACK_DEPTH = 64
+# Edges contributing less than this share of a root, or under a microsecond,
+# are not expanded; the node cap bounds the walk for very wide call graphs.
+_MIN_SCALE = 0.001
+_MAX_WALK_NODES = 100_000
+
+
+class RequestProfile:
+    """Profiling session bound to a single handler invocation."""
+
+    def __init__(self, agent_name: str, company_id: str | None, thread_id: str | None, output_dir: str, top_n: int) -> None:
+        self.agent_name = agent_name
+        self.company_id = company_id
+        self.thread_id = thread_id
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self._profiler = cProfile.Profile()
+        self._started_tracemalloc = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._profiler.enable()
+
+    def stop(self) -> None:
+        """Stop collecting; must run on the thread that called ``start``."""
+        self._profiler.disable()
+        self._snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def write(self) -> Path:
+        """Collapse the stacks and write both files; safe to run in a worker thread."""
+        snapshot = self._snapshot
+        output_dir = Path(self.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stem = '_'.join((
+            _safe_name(self.agent_name),
+            _safe_name(self.company_id or 'unknown'),
+            _safe_name(self.thread_id or 'new'),
+            str(int(time.time() * 1000))
+        ))
+        collapsed_path = output_dir / f'{stem}.collapsed'
+        stacks = collapse_stats(pstats.Stats(self._profiler))
+        collapsed_path.write_text(
+            ''.join(f'{stack} {value}\n' for stack, value in stacks.most_common()),
+            encoding='utf-8'
+        )
+
+        alloc_lines = [f'# top {self.top_n} allocation sites for {stem}']
+        for stat in snapshot.statistics('lineno')[:self.top_n]:
+            frame = stat.traceback[0]
+            alloc_lines.append(f'{stat.size} B\t{stat.count} blocks\t{frame.filename}:{frame.lineno}')
+        (output_dir / f'{stem}.alloc.txt').write_text('\n'.join(alloc_lines) + '\n', encoding='utf-8')
+        return collapsed_path
+
+
+@contextlib.asynccontextmanager
+async def profile_request(req, agent_name: str) -> AsyncIterator[Optional[RequestProfile]]:
+    """Profile the enclosed block if the request is selected.
+
+    This samples the event loop while the request runs (see the module
+    docstring), so concurrent requests on the same loop show up too. The
+    stacks are collapsed and written in a worker thread. Yields None when
+    the request is not profiled. Handlers may update ``thread_id`` on the
+    yielded profile once the runtime assigns one.
+    """
+    if not config.get_profiling_enabled() or not _should_profile(req):
+        yield None
+        return
+    if not _active_lock.acquire(blocking=False):
+        logger.debug('Another request is being profiled; skipping')
+        yield None
+        return
+
+    try:
+        profile = RequestProfile(
+            agent_name=agent_name,
+            company_id=req.headers.get(config.get_company_header_name()),
+            thread_id=req.params.get('thread_id'),
+            output_dir=config.get_profiling_output_dir(),
+            top_n=config.get_profiling_top_n()
+        )
+        profile.start()
+        try:
+            yield profile
+        finally:
+            try:
+                profile.stop()
+                path = await asyncio.to_thread(profile.write)
+                logger.info('Profile written to %s', path)
+            except Exception as exc:
+                logger.error('Failed to write profile: %s', exc)
+    finally:
+        _active_lock.release()
+
+
+def collapse_stats(stats: pstats.Stats) -> Counter:
+    """Convert a cProfile call graph into collapsed stacks.
+
+    cProfile only records caller/callee edges, so deeper stacks are
+    reconstructed by splitting each function's time across its callers in
+    proportion to the cumulative time of each edge. Functions without
+    callers are roots; call cycles that no root reaches (a recursive
+    function already running when profiling started) are rooted at their
+    most expensive member. Negligible edges are pruned and the walk stops
+    after ``_MAX_WALK_NODES`` nodes.
+    """
+    raw = stats.stats  # type: ignore[attr-defined]
+    callees: dict[tuple, dict[tuple, tuple[float, float]]] = defaultdict(dict)
+    for func, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = (edge[2], edge[3])
+
+    stacks: Counter = Counter()
+    visited = 0
+
+    def walk(func: tuple, path: tuple[str, ...], self_time: float, scale: float) -> None:
+        nonlocal visited
+        visited += 1
+        path = path + (_frame_label(func),)
+        micros = int(self_time * 1_000_000)
+        if micros > 0:
+            stacks[';'.join(path)] += micros
+        if len(path) >= _MAX_STACK_DEPTH:
+            return
+        for child, (edge_tt, edge_ct) in callees.get(func, {}).items():
+            if visited >= _MAX_WALK_NODES:
+                return
+            child_label = _frame_label(child)
+            if child_label in path:
+                continue
+            child_total = raw[child][3]
+            child_scale = (edge_ct * scale / child_total) if child_total > 0 else 0.0
+            if child_scale < _MIN_SCALE or edge_ct * scale < 1e-6:
+                continue
+            walk(child, path, edge_tt * scale, child_scale)
+
+    reached: set[tuple] = set()
+
+    def mark(func: tuple) -> None:
+        pending = [func]
+        while pending:
+            current = pending.pop()
+            if current not in reached:
+                reached.add(current)
+                pending.extend(callees.get(current, ()))
+
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    for func in roots:
+        mark(func)
+    for func in sorted(raw, key=lambda item: raw[item][3], reverse=True):
+        if func not in reached:
+            roots.append(func)
+            mark(func)
+
+    for func in roots:
+        walk(func, (), raw[func][2], 1.0)
+    if visited >= _MAX_WALK_NODES:
+        logger.warning('Collapsed stacks truncated after %s nodes', visited)
+    return stacks
+
+
+def aggregate(directory: str, company_id: str | None = None, agent_name: str | None = None) -> Counter:
+    merged: Counter = Counter()
+    for path in sorted(Path(directory).glob('*.collapsed')):
+        parts = path.stem.split('_')
+        if agent_name and (not parts or parts[0] != _safe_name(agent_name)):
+            continue
+        if company_id and (len(parts) < 2 or parts[1] != _safe_name(company_id)):
+            continue
+        for line in path.read_text(encoding='utf-8').splitlines():
+            stack, _, value = line.rpartition(' ')
+            if stack and value.isdigit():
+                merged[stack] += int(value)
+    return merged
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Aggregate captured request profiles into one collapsed-stack file.')
+    parser.add_argument('directory', nargs='?', default=None, help='Profile directory (defaults to PROFILING_OUTPUT_DIR)')
+    parser.add_argument('-o', '--output', help='Output file (defaults to stdout)')
+    parser.add_argument('--company', help='Only include profiles for this company id')
+    parser.add_argument('--agent', help='Only include profiles for this agent (SOPHIA or VICTOR)')
+    args = parser.parse_args(argv)
+
+    merged = aggregate(args.directory or config.get_profiling_output_dir(), args.company, args.agent)
+    lines = ''.join(f'{stack} {value}\n' for stack, value in merged.most_common())
+    if args.output:
+        Path(args.output).write_text(lines, encoding='utf-8')
+    else:
+        sys.stdout.write(lines)
+    return 0
+
+
+def _should_profile(req) -> bool:
+    token = config.get_profiling_token()
+    header_value = req.headers.get(config.get_profiling_header_name())
+    if token and header_value and hmac.compare_digest(header_value, token):
+        return True
+    rate = config.get_profiling_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def _frame_label(func: tuple) -> str:
+    filename, lineno, name = func
+    if filename == '~':
+        return name.replace(';', ':')
+    return f'{os.path.basename(filename)}:{name}:{lineno}'.replace(';', ':')
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9.-]', '-', str(value))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
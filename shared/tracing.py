@@ -0,0 +1,175 @@
+"""Distributed tracing for agent handlers and outbound calls.
+
+Built on OpenTelemetry when it is installed and ``TRACING_ENABLED`` is set;
+otherwise every helper is a no-op. Spans are head-sampled with a
+parent-based ratio sampler and exported in the background by a batch
+processor, either to OTLP/HTTP (``OTEL_EXPORTER_OTLP_ENDPOINT``) or to a
+local JSON-lines file. W3C ``traceparent`` is accepted from incoming
+requests and injected into every backend call. The provider is also
+registered globally, so the agent framework's own spans join the same
+trace, and buffered spans are flushed at interpreter exit.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import logging
+import threading
+from typing import Any, Iterator, Mapping, Optional
+
+from shared import config
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # pragma: no cover - tracing stays disabled without the SDK
+    trace = None
+
+
+logger = logging.getLogger(__name__)
+
+_tracer: Optional[Any] = None
+_provider: Optional[Any] = None
+_init_lock = threading.Lock()
+_initialized = False
+
+_SPAN_KINDS = ('server', 'client', 'internal', 'consumer', 'producer')
+
+
+if trace is not None:
+    class FileSpanExporter(SpanExporter):
+        """Appends finished spans to a local file, one JSON object per line."""
+
+        def __init__(self, path: str) -> None:
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> 'SpanExportResult':
+            lines = ''.join(span.to_json(indent=None) + '\n' for span in spans)
+            try:
+                with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+                    handle.write(lines)
+            except OSError as exc:
+                logger.warning('Failed to write spans to %s: %s', self.path, exc)
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            return None
+
+
+def init_tracing() -> bool:
+    """Configure the tracer provider once; returns whether tracing is active."""
+    global _tracer, _provider, _initialized
+
+    if _initialized:
+        return _tracer is not None
+    with _init_lock:
+        if _initialized:
+            return _tracer is not None
+        settings = config.get_settings()
+        if settings.tracing_enabled and trace is None:
+            logger.warning('TRACING_ENABLED is set but opentelemetry-sdk is not installed')
+        if settings.tracing_enabled and trace is not None:
+            try:
+                provider = TracerProvider(
+                    resource=Resource.create({'service.name': settings.tracing_service_name}),
+                    sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+                    shutdown_on_exit=False
+                )
+                provider.add_span_processor(BatchSpanProcessor(_build_exporter(settings)))
+                trace.set_tracer_provider(provider)
+                atexit.register(shutdown_tracing)
+                _provider = provider
+                _tracer = provider.get_tracer(__name__)
+            except Exception as exc:
+                logger.error('Failed to initialize tracing: %s', exc)
+                _tracer = None
+        _initialized = True
+        return _tracer is not None
+
+
+def flush_tracing(timeout_millis: int = 5000) -> bool:
+    """Export spans still buffered by the batch processor; True when done."""
+    if _provider is None:
+        return True
+    return _provider.force_flush(timeout_millis)
+
+
+def shutdown_tracing() -> None:
+    """Flush and shut down the provider; runs at exit when tracing is active."""
+    global _provider, _tracer
+
+    with _init_lock:
+        provider, _provider, _tracer = _provider, None, None
+    if provider is not None:
+        try:
+            provider.shutdown()
+        except Exception as exc:
+            logger.warning('Failed to shut down tracing: %s', exc)
+
+
+@contextlib.contextmanager
+def start_span(name: str, kind: str = 'internal', **attributes: Any) -> Iterator[Optional[Any]]:
+    """Run the enclosed block in a child span of the current context."""
+    if not init_tracing():
+        yield None
+        return
+    span_kind = getattr(trace.SpanKind, kind.upper()) if kind in _SPAN_KINDS else trace.SpanKind.INTERNAL
+    with _tracer.start_as_current_span(name, kind=span_kind, attributes=_clean(attributes)) as span:
+        yield span
+
+
+@contextlib.contextmanager
+def continue_trace(carrier: Mapping[str, str] | None) -> Iterator[None]:
+    """Make the trace context found in ``carrier`` (headers or event) current."""
+    if not carrier or not init_tracing():
+        yield
+        return
+    token = otel_context.attach(propagate.extract(_lower_keys(carrier)))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+def inject_headers(headers: dict[str, Any]) -> dict[str, Any]:
+    """Add ``traceparent``/``tracestate`` for the current span to ``headers``."""
+    if init_tracing():
+        propagate.inject(headers)
+    return headers
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Set attributes on the current span, skipping empty values."""
+    if not init_tracing():
+        return
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attributes(_clean(attributes))
+
+
+def _build_exporter(settings: config.Settings):
+    if settings.tracing_exporter == 'file':
+        return FileSpanExporter(settings.tracing_file_path)
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    return OTLPSpanExporter()
+
+
+def _clean(attributes: Mapping[str, Any]) -> dict[str, Any]:
+    cleaned = {}
+    for key, value in attributes.items():
+        if value is None or value == '':
+            continue
+        cleaned[key.replace('__', '.')] = value if isinstance(value, (str, bool, int, float)) else str(value)
+    return cleaned
+
+
+def _lower_keys(carrier: Mapping[str, str]) -> dict[str, str]:
+    return {str(key).lower(): value for key, value in carrier.items() if value is not None}
@@ -0,0 +1,122 @@
+"""Instance warm-up routine.
+
+Pays the cold-start costs (DNS, TLS, token round trips, first-use imports)
+before real traffic arrives and reports how long each step took.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from shared import config
+from shared.agent_auth import get_agent_token
+from shared.backend_client import BackendClient
+from shared.imports import ensure_repo_root_on_path
+
+
+logger = logging.getLogger(__name__)
+
+AGENT_TYPES = ('SOPHIA', 'VICTOR')
+
+
+async def run_warmup(agents: dict[str, Any] | None = None, companies: list[str] | None = None) -> dict:
+    """Run every warm-up step and return per-step timings.
+
+    ``agents`` maps agent names to Agent Framework agents whose LLM
+    connection pool should be opened. Their HTTP clients are bound to the
+    event loop that created them, so pass agents only when running on the
+    worker's own loop.
+    """
+    companies = companies if companies is not None else config.get_warmup_companies()
+    started = time.perf_counter()
+    steps: list[dict] = []
+
+    await _run_step(steps, 'backend_connections', lambda: asyncio.to_thread(_warm_backend))
+
+    token_steps = [
+        _run_step(
+            steps,
+            f'agent_token:{company_id}:{agent_type}',
+            lambda company_id=company_id, agent_type=agent_type: asyncio.to_thread(get_agent_token, company_id, agent_type)
+        )
+        for company_id in companies
+        for agent_type in AGENT_TYPES
+    ]
+    llm_steps = [
+        _run_step(steps, f'llm_connection:{name}', lambda agent=agent: _warm_llm(agent))
+        for name, agent in (agents or {}).items()
+    ]
+    await asyncio.gather(*token_steps, *llm_steps)
+
+    await _run_step(steps, 'serialization', lambda: asyncio.to_thread(_warm_serialization))
+
+    report = {
+        'companies': companies,
+        'steps': steps,
+        'total_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+    logger.info('Warm-up finished in %s ms', report['total_ms'])
+    return report
+
+
+def start_background_warmup() -> threading.Thread:
+    """Warm up backend connections and tokens in a daemon thread at host start."""
+    def target() -> None:
+        try:
+            report = asyncio.run(run_warmup())
+            logger.info('Startup warm-up report: %s', json.dumps(report))
+        except Exception as exc:
+            logger.error('Startup warm-up failed: %s', exc)
+
+    thread = threading.Thread(target=target, name='agent-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+async def _run_step(steps: list[dict], name: str, step: Callable[[], Awaitable[Any]]) -> None:
+    started = time.perf_counter()
+    entry: dict[str, Any] = {'step': name}
+    try:
+        await step()
+        entry['ok'] = True
+    except Exception as exc:
+        entry['ok'] = False
+        entry['error'] = str(exc)
+        logger.warning('Warm-up step %s failed: %s', name, exc)
+    entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    steps.append(entry)
+
+
+def _warm_backend() -> None:
+    BackendClient().warm_up(config.get_warmup_backend_connections())
+
+
+async def _warm_llm(agent: Any) -> None:
+    chat_client = getattr(agent, 'chat_client', None)
+    openai_client = getattr(chat_client, 'client', None)
+    models = getattr(openai_client, 'models', None)
+    if models is None:
+        raise RuntimeError('Agent does not expose an OpenAI client to warm up')
+    # Listing models opens the pooled HTTPS connection without spending tokens.
+    await models.list()
+
+
+def _warm_serialization() -> None:
+    ensure_repo_root_on_path()
+    from domain.agent.contracts.action_plan import ActionPlan, ActionStep
+    from domain.agent.contracts.agent_inputs import AgentInput
+    from domain.agent.contracts.agent_outputs import AgentOutput
+
+    agent_input = AgentInput(message='warmup', ticket_id=0, thread_id='warmup')
+    plan = ActionPlan(
+        ticket_id=0,
+        summary='warmup',
+        steps=(ActionStep(step_id='step-1', tool='noop', description='warmup', parameters={'noop': True}),)
+    )
+    output = AgentOutput(text='warmup', thread_id='warmup', action_plan=plan, metadata={'warmup': True})
+    json.loads(json.dumps({'input': agent_input.to_dict(), 'output': output.to_dict()}))
@@ -1,8 +1,10 @@
 """Sophia durable agent Azure Function (v0)."""
 
+import asyncio
 import json
 import logging
 import os
+import time
 import traceback
 import azure.functions as func
 
@@ -13,10 +15,22 @@ except Exception as exc:
     logging.getLogger(__name__).error('Traceback: %s', traceback.format_exc())
     raise
 from shared.agent_auth import get_agent_token
+from shared.agent_clients import RuleBasedAgentChatClient, classify_message, get_agent_thread
 from shared.backend_client import BackendClient
-from shared.config import get_company_header_name
+from shared.concurrency import release, try_acquire
+from shared.config import (
+    for_company,
+    get_company_header_name,
+    get_hybrid_confidence_threshold,
+    get_settings,
+    get_ticket_events_enabled
+)
+from shared.events import build_ticket_created_event, publish_ticket_created
 from shared.imports import ensure_repo_root_on_path
+from shared.metrics import record_agent_latency
+from shared.profiling import profile_request
 from shared.tools import ticket_create
+from shared.tracing import continue_trace, set_attributes, start_span
 
 
 logger = logging.getLogger(__name__)
@@ -28,24 +42,74 @@ if not logger.handlers:
 logger.setLevel(logging.DEBUG)
 
 
-def _build_agent():
+_INSTRUCTIONS = 'Eres SOPHIA, una agente de triage muy amable. DEBES responder SIEMPRE en ESPAÑOL. Comienza siempre tu respuesta con un saludo afectuoso y preséntate brevemente.'
+
+
+def _build_agent(deployment_name: str | None):
     client = AzureOpenAIChatClient(
         endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
         api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-        deployment_name=os.getenv('AZURE_OPENAI_DEPLOYMENT'),
+        deployment_name=deployment_name,
         api_version=os.getenv('AZURE_OPENAI_API_VERSION')
     )
     return client.as_agent(
         name='SOPHIA',
-        instructions='Eres SOPHIA, una agente de triage muy amable. DEBES responder SIEMPRE en ESPAÑOL. Comienza siempre tu respuesta con un saludo afectuoso y preséntate brevemente.'
+        instructions=_INSTRUCTIONS
     )
 
 
-sophia_agent = _build_agent()
+# One agent per LLM deployment so companies can be routed to their own deployment.
+_agents_by_deployment: dict[str | None, object] = {}
+
+
+def _get_agent(deployment_name: str | None):
+    agent = _agents_by_deployment.get(deployment_name)
+    if agent is None:
+        agent = _build_agent(deployment_name)
+        _agents_by_deployment[deployment_name] = agent
+    return agent
+
+
+_rules_agents: dict[tuple[str, ...], object] = {}
+
+
+def _get_rules_agent(keywords: tuple[str, ...]):
+    agent = _rules_agents.get(keywords)
+    if agent is None:
+        agent = RuleBasedAgentChatClient('SOPHIA', keywords).as_agent(name='SOPHIA', instructions=_INSTRUCTIONS)
+        _rules_agents[keywords] = agent
+    return agent
+
+
+# The LLM client is only built at import when the deployment default needs it.
+if get_settings().chat_mode == 'rules':
+    sophia_agent = _get_rules_agent(get_settings().classifier_keywords)
+else:
+    sophia_agent = _get_agent(get_settings().llm_deployment)
 app = AgentFunctionApp(agents=[sophia_agent])
 
 
 async def main(req: func.HttpRequest) -> func.HttpResponse:
+    company_id = req.headers.get(get_company_header_name())
+    if company_id and not try_acquire(company_id, for_company(company_id).max_concurrent_requests):
+        logger.warning('Concurrency limit reached for company %s', company_id)
+        return func.HttpResponse(
+            json.dumps({'error': 'Too many concurrent requests for company'}),
+            status_code=429,
+            mimetype='application/json'
+        )
+    try:
+        with continue_trace(req.headers), start_span('SOPHIA request', kind='server', agent__company_id=company_id):
+            async with profile_request(req, 'SOPHIA') as profile:
+                response = await _handle(req, profile)
+            set_attributes(http__response__status_code=response.status_code)
+            return response
+    finally:
+        if company_id:
+            release(company_id)
+
+
+async def _handle(req: func.HttpRequest, profile) -> func.HttpResponse:
     logger.info('SOPHIA request received')
     try:
         company_header = get_company_header_name()
@@ -62,6 +126,7 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400,
                 mimetype='application/json'
             )
+        tenant = for_company(company_id)
 
         raw_body = ''
         try:
@@ -87,17 +152,34 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         logger.info('Message length: %s', len(message))
         logger.info('Thread id provided: %s', bool(thread_id))
 
-        logger.info('Running agent')
-        agent_result = await _run_agent(sophia_agent, message, thread_id)
+        with start_span('sophia.classify'):
+            classification, confidence = classify_message(message, tenant.classifier_keywords)
+        use_rules = tenant.chat_mode == 'rules' or (
+            tenant.chat_mode == 'hybrid' and confidence >= get_hybrid_confidence_threshold()
+        )
+        chat_mode = tenant.chat_mode if tenant.chat_mode != 'hybrid' else f"hybrid/{'rules' if use_rules else 'llm'}"
+        agent = _get_rules_agent(tenant.classifier_keywords) if use_rules else _get_agent(tenant.llm_deployment)
+
+        logger.info('Running agent (chat mode %s)', chat_mode)
+        started = time.perf_counter()
+        with start_span('sophia.agent_run', kind='client', agent__chat_mode=chat_mode):
+            agent_result = await _run_agent(agent, message, thread_id)
+        record_agent_latency('SOPHIA', chat_mode, time.perf_counter() - started)
         logger.debug('Agent result keys: %s', list(agent_result.keys()))
 
-        classification = _classify_message(message)
         response_text = agent_result.get('text') or _build_response_text(classification)
         resolved_thread_id = agent_result.get('thread_id') or thread_id
-        metadata: dict[str, object] = {'classification': classification}
+        if profile:
+            profile.thread_id = resolved_thread_id
+        set_attributes(agent__thread_id=resolved_thread_id, agent__classification=classification, agent__chat_mode=chat_mode)
+        metadata: dict[str, object] = {
+            'classification': classification,
+            'confidence': confidence,
+            'chat_mode': chat_mode
+        }
 
         try:
-            backend_client = BackendClient()
+            backend_client = BackendClient(timeout=tenant.backend_timeout)
         except Exception as exc:
             logger.error('Backend configuration error: %s', exc)
             return func.HttpResponse(
@@ -113,17 +195,23 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
             subject = 'Automated security request'
             description = message or 'Automated request captured by SOPHIA'
             logger.info('Creating ticket in backend')
-            agent_token = get_agent_token(company_id, 'SOPHIA')
             ticket_status = 'PENDING' if classification == 'AUTOMATED' else 'DERIVED'
-            ticket_response = ticket_create(
-                backend_client,
-                subject=subject,
-                description=description,
-                company_id=company_id,
-                status=ticket_status,
-                auth_header=f'Bearer {agent_token}'
-            )
+            with start_span('sophia.ticket_create', agent__ticket_status=ticket_status):
+                agent_token = get_agent_token(company_id, 'SOPHIA')
+                ticket_response = ticket_create(
+                    backend_client,
+                    subject=subject,
+                    description=description,
+                    company_id=company_id,
+                    status=ticket_status,
+                    auth_header=f'Bearer {agent_token}'
+                )
             metadata['ticket'] = ticket_response
+            if isinstance(ticket_response, dict):
+                set_attributes(agent__ticket_id=ticket_response.get('id'))
+            if classification == 'AUTOMATED' and get_ticket_events_enabled():
+                with start_span('sophia.publish_event', kind='producer'):
+                    await _publish_ticket_created(company_id, ticket_response, classification, resolved_thread_id, metadata)
 
         output = AgentOutput(
             text=response_text,
@@ -150,12 +238,20 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
-def _classify_message(message: str) -> str:
-    normalized = (message or '').lower()
-    keywords = ('automated', 'auto', 'runbook', 'playbook', 'block', 'isolate', 'disable', 'quarantine')
-    if any(keyword in normalized for keyword in keywords):
-        return 'AUTOMATED'
-    return 'MANUAL'
+async def _publish_ticket_created(company_id: str, ticket: dict, classification: str, thread_id: str | None, metadata: dict) -> None:
+    ticket_id = ticket.get('id') if isinstance(ticket, dict) else None
+    if not isinstance(ticket_id, int):
+        logger.warning('Ticket response has no integer id; not publishing ticket.created')
+        return
+    try:
+        event = build_ticket_created_event(company_id, ticket_id, classification, thread_id)
+        # The queue SDK is blocking; keep it off the event loop.
+        await asyncio.to_thread(publish_ticket_created, event)
+        metadata['ticket_event_id'] = event['event_id']
+        logger.info('Published ticket.created event %s for ticket %s', event['event_id'], ticket_id)
+    except Exception as exc:
+        # VICTOR can still plan the ticket on demand, so the request succeeds.
+        logger.error('Failed to publish ticket.created event: %s', exc)
 
 
 def _build_response_text(classification: str) -> str:
@@ -166,9 +262,9 @@ def _build_response_text(classification: str) -> str:
 
 async def _run_agent(agent, message: str, thread_id: str | None) -> dict:
     if hasattr(agent, 'run'):
-        result = await agent.run(message=message, thread_id=thread_id)
+        result = await agent.run(message, thread=get_agent_thread(agent, thread_id))
     elif hasattr(agent, 'chat'):
-        result = await agent.chat(message=message, thread_id=thread_id)
+        result = await agent.chat(message, thread=get_agent_thread(agent, thread_id))
     else:
         raise RuntimeError('ChatAgent does not expose a run/chat method')
 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+
+# Handlers build their default agent at import; rules mode needs no LLM endpoint.
+os.environ.setdefault('CHAT_MODE', 'rules')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
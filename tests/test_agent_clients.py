@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from shared.agent_clients import classify_message, get_agent_thread
+from shared.config import DEFAULT_CLASSIFIER_KEYWORDS
+from sophia_agent import handler as sophia_handler
+
+
+@pytest.mark.parametrize('message', [
+    'Please run the automated playbook to isolate host-12',
+    'The user cannot log in to the portal'
+])
+def test_rules_mode_reply_matches_classification(message):
+    agent = sophia_handler._get_rules_agent(DEFAULT_CLASSIFIER_KEYWORDS)
+    classification, _ = classify_message(message, DEFAULT_CLASSIFIER_KEYWORDS)
+
+    result = asyncio.run(sophia_handler._run_agent(agent, message, None))
+
+    assert f'clasificado como {classification}' in result['text']
+
+
+def test_agent_thread_is_reused_per_thread_id():
+    agent = sophia_handler._get_rules_agent(DEFAULT_CLASSIFIER_KEYWORDS)
+
+    assert get_agent_thread(agent, None) is None
+    thread = get_agent_thread(agent, 'thread-1')
+    assert get_agent_thread(agent, 'thread-1') is thread
+    assert get_agent_thread(agent, 'thread-2') is not thread
+
+    result = asyncio.run(sophia_handler._run_agent(agent, 'disable the account', 'thread-1'))
+    assert 'AUTOMATED' in result['text']
+    assert result['thread_id'] == 'thread-1'
@@ -0,0 +1,54 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from shared import backend_client, config
+from shared.backend_client import BackendClient, get_http_session
+from shared.hedging import HEDGE_EXECUTOR_WORKERS
+
+
+class _Handler(BaseHTTPRequestHandler):
+    cookies_seen: list = []
+
+    def do_GET(self):
+        _Handler.cookies_seen.append(self.headers.get('Cookie'))
+        body = json.dumps({'id': 1, 'company': self.headers.get('X-Company-Id')}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'ARRAffinity=instance-a; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend_url(monkeypatch):
+    server = HTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(backend_client, '_session', None)
+    _Handler.cookies_seen = []
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_session_does_not_carry_cookies_across_companies(backend_url):
+    client = BackendClient(base_url=backend_url, timeout=5)
+
+    assert client.ticket_get(company_id='A', ticket_id=1)['company'] == 'A'
+    assert client.ticket_get(company_id='B', ticket_id=1)['company'] == 'B'
+
+    assert _Handler.cookies_seen == [None, None]
+    assert len(get_http_session().cookies) == 0
+
+
+def test_session_pool_fits_warmed_connections_and_hedges(backend_url):
+    adapter = get_http_session().get_adapter('https://backend.example')
+
+    assert adapter._pool_maxsize >= config.get_warmup_backend_connections() + HEDGE_EXECUTOR_WORKERS
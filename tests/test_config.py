@@ -0,0 +1,106 @@
+import dataclasses
+import json
+
+import pytest
+
+from shared import config
+
+
+@pytest.fixture
+def overrides_file(tmp_path, monkeypatch):
+    path = tmp_path / 'company_overrides.json'
+    monkeypatch.setenv('COMPANY_OVERRIDES_FILE', str(path))
+    monkeypatch.setenv('COMPANY_OVERRIDES_TTL_SECONDS', '3600')
+    yield path
+    monkeypatch.undo()
+    config.reload_settings()
+
+
+def _write(path, companies):
+    path.write_text(json.dumps({'companies': companies}), encoding='utf-8')
+
+
+def test_resolve_applies_valid_overrides_and_ignores_the_rest():
+    settings = config.get_settings()
+    view = config._resolve(settings, '42', {
+        'backend_timeout': 3,
+        'classifier_keywords': [' Block ', 'isolate'],
+        'max_concurrent_requests': 0,
+        'llm_deployment': ' gpt-4o-mini ',
+        'chat_mode': 'HYBRID',
+        'unknown_key': 'x'
+    })
+
+    assert view.company_id == '42'
+    assert view.backend_timeout == 3
+    assert view.classifier_keywords == ('block', 'isolate')
+    assert view.max_concurrent_requests == 0
+    assert view.llm_deployment == 'gpt-4o-mini'
+    assert view.chat_mode == 'hybrid'
+
+
+@pytest.mark.parametrize('key, value', [
+    ('backend_timeout', 0),
+    ('backend_timeout', True),
+    ('backend_timeout', 'soon'),
+    ('classifier_keywords', 'block'),
+    ('classifier_keywords', ['block', '']),
+    ('max_concurrent_requests', -1),
+    ('llm_deployment', '  '),
+    ('chat_mode', 'manual')
+])
+def test_resolve_keeps_defaults_for_invalid_values(key, value):
+    settings = config.get_settings()
+
+    view = config._resolve(settings, '42', {key: value})
+
+    assert getattr(view, key) == getattr(settings.tenant_defaults('42'), key)
+
+
+def test_refresh_swaps_overrides_atomically(overrides_file):
+    _write(overrides_file, {'42': {'backend_timeout': 3}})
+    config.reload_settings()
+    first = config.refresh_overrides(force=True)
+    assert config.for_company('42').backend_timeout == 3
+    assert config.for_company(42) is config.for_company('42')
+
+    _write(overrides_file, {'42': {'backend_timeout': 7}})
+    second = config.refresh_overrides(force=True)
+
+    assert second is not first
+    assert first.overrides == {'42': {'backend_timeout': 3}}
+    assert config.for_company('42').backend_timeout == 7
+
+
+def test_failed_reload_keeps_previous_overrides(overrides_file):
+    _write(overrides_file, {'42': {'chat_mode': 'rules'}})
+    config.reload_settings()
+    config.refresh_overrides(force=True)
+
+    overrides_file.write_text('{not json', encoding='utf-8')
+    config.refresh_overrides(force=True)
+
+    assert config.for_company('42').chat_mode == 'rules'
+
+
+def test_companies_without_overrides_are_not_cached(overrides_file):
+    _write(overrides_file, {})
+    config.reload_settings()
+    state = config.refresh_overrides(force=True)
+
+    for company_id in range(100):
+        assert config.for_company(company_id).company_id == str(company_id)
+
+    assert state.views == {}
+
+
+def test_expired_overrides_reload_in_background(overrides_file):
+    _write(overrides_file, {'42': {'backend_timeout': 3}})
+    config.reload_settings()
+    state = config.refresh_overrides(force=True)
+    _write(overrides_file, {'42': {'backend_timeout': 7}})
+    config._override_state = dataclasses.replace(state, loaded_at=float('-inf'))
+
+    assert config.for_company('42').backend_timeout == 3
+    config._refresh_thread.join(timeout=5)
+    assert config.for_company('42').backend_timeout == 7
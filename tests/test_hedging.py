@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from shared.hedging import HedgingPolicy
+
+
+def _trained(budget_percent=50.0, requests=0, latency=0.01):
+    policy = HedgingPolicy(percentile=0.9, budget_percent=budget_percent, min_delay=0.0, min_samples=5)
+    for _ in range(5):
+        policy.record(latency)
+    policy._requests = requests
+    return policy
+
+
+def test_runs_inline_while_learning():
+    policy = HedgingPolicy(min_samples=5)
+
+    assert policy.delay() is None
+    assert policy.execute(lambda: threading.current_thread()) is threading.current_thread()
+    assert policy.stats()['samples'] == 1
+
+
+def test_delay_uses_percentile_with_floor():
+    policy = HedgingPolicy(percentile=0.5, min_delay=0.02, min_samples=3)
+    for seconds in (0.01, 0.03, 0.05):
+        policy.record(seconds)
+
+    assert policy.delay() == 0.03
+    policy.min_delay = 0.1
+    assert policy.delay() == 0.1
+
+
+@pytest.mark.parametrize('budget_percent, requests, expected', [
+    (5.0, 19, [False]),
+    (5.0, 20, [True, False]),
+    (10.0, 20, [True, True, False]),
+    (0.0, 1000, [False])
+])
+def test_budget_caps_hedges_to_percent_of_requests(budget_percent, requests, expected):
+    policy = _trained(budget_percent, requests)
+
+    assert [policy._acquire_hedge() for _ in expected] == expected
+    stats = policy.stats()
+    assert stats['hedges_fired'] == expected.count(True)
+    assert stats['hedges_denied_by_budget'] == expected.count(False)
+
+
+def test_hedge_wins_when_primary_is_slow():
+    policy = _trained(requests=10)
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return 'primary'
+        return 'hedge'
+
+    assert policy.execute(fn) == 'hedge'
+    assert policy.stats()['hedges_fired'] == 1
+    assert policy.stats()['hedges_won'] == 1
+
+
+def test_falls_through_to_the_other_attempt_on_error():
+    policy = _trained(requests=10)
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise ConnectionError('primary failed')
+        time.sleep(0.2)
+        return 'hedge'
+
+    assert policy.execute(fn) == 'hedge'
+
+
+def test_raises_last_error_when_both_attempts_fail():
+    policy = _trained(requests=10)
+    calls = []
+
+    def fn():
+        calls.append(None)
+        time.sleep(0.1)
+        raise ConnectionError(f'attempt {len(calls)}')
+
+    with pytest.raises(ConnectionError):
+        policy.execute(fn)
+    assert len(calls) == 2
+
+
+def test_runs_on_caller_thread_without_budget():
+    policy = _trained(budget_percent=0.0, requests=10)
+
+    def fn():
+        time.sleep(0.05)
+        return threading.current_thread()
+
+    assert policy.execute(fn) is threading.current_thread()
+    assert policy.stats()['hedges_fired'] == 0
+
+
+def test_slow_primary_is_denied_when_budget_runs_out_mid_flight():
+    policy = _trained(budget_percent=10.0, requests=9, latency=0.05)
+    release = threading.Event()
+
+    def fn():
+        release.wait(1)
+        return 'primary'
+
+    # The tenth request leaves room for exactly one hedge; spend it meanwhile.
+    worker = threading.Timer(0.005, policy._acquire_hedge)
+    worker.start()
+    threading.Timer(0.1, release.set).start()
+
+    assert policy.execute(fn) == 'primary'
+    worker.join()
+    assert policy.stats()['hedges_fired'] == 1
+    assert policy.stats()['hedges_denied_by_budget'] == 1
+
+
+def test_threshold_starts_when_fn_starts(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from shared import hedging
+
+    # A single busy worker makes the primary queue for longer than the threshold.
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(hedging, '_get_executor', lambda: executor)
+    policy = _trained(requests=10, latency=0.05)
+    blocker = executor.submit(time.sleep, 0.2)
+
+    assert policy.execute(lambda: 'primary') == 'primary'
+    assert blocker.done()
+    assert policy.stats()['hedges_fired'] == 0
+    executor.shutdown()
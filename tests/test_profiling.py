@@ -0,0 +1,51 @@
+import time
+
+from shared import profiling
+
+
+class _Stats:
+    def __init__(self, stats):
+        self.stats = stats
+
+
+F = ('app.py', 1, 'handle')
+G = ('app.py', 10, 'fetch')
+
+
+def test_collapse_roots_recursive_function_entered_before_profiling():
+    # handle() recursed into itself and called fetch(); it has no external caller.
+    stats = _Stats({
+        F: (2, 1, 0.3, 1.0, {F: (1, 1, 0.1, 0.5)}),
+        G: (1, 1, 0.7, 0.7, {F: (1, 1, 0.7, 0.7)})
+    })
+
+    stacks = profiling.collapse_stats(stats)
+
+    assert stacks == {'app.py:handle:1': 300_000, 'app.py:handle:1;app.py:fetch:10': 700_000}
+
+
+def test_collapse_is_bounded_on_dense_call_graphs():
+    # Every function of a layer calls every function of the next one.
+    layers = [[(f'm{depth}.py', index, f'f{depth}_{index}') for index in range(8)] for depth in range(30)]
+    raw = {func: (1, 1, 0.001, 1.0, {}) for func in layers[0]}
+    for parents, children in zip(layers, layers[1:]):
+        for child in children:
+            raw[child] = (8, 8, 0.001, 1.0, {parent: (1, 1, 0.001 / 8, 1.0 / 8) for parent in parents})
+
+    started = time.perf_counter()
+    stacks = profiling.collapse_stats(_Stats(raw))
+
+    assert time.perf_counter() - started < 10
+    assert 0 < len(stacks) <= profiling._MAX_WALK_NODES
+
+
+def test_request_profile_writes_collapsed_and_alloc_files(tmp_path):
+    profile = profiling.RequestProfile('SOPHIA', '42', 'thread-1', str(tmp_path), top_n=5)
+
+    profile.start()
+    sum(range(10_000))
+    profile.stop()
+    path = profile.write()
+
+    assert path.name.startswith('SOPHIA_42_thread-1_') and path.suffix == '.collapsed'
+    assert path.with_suffix('.alloc.txt').read_text(encoding='utf-8').startswith('# top 5 allocation sites')
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+from opentelemetry import trace
+
+from shared import config, tracing
+
+
+@pytest.fixture
+def file_tracing(tmp_path, monkeypatch):
+    path = tmp_path / 'spans.jsonl'
+    monkeypatch.setenv('TRACING_ENABLED', 'true')
+    monkeypatch.setenv('TRACING_EXPORTER', 'file')
+    monkeypatch.setenv('TRACING_FILE_PATH', str(path))
+    config.reload_settings()
+    monkeypatch.setattr(tracing, '_initialized', False)
+    yield path
+    tracing.shutdown_tracing()
+    monkeypatch.undo()
+    config.reload_settings()
+    tracing._initialized = False
+
+
+def test_buffered_spans_are_exported_on_shutdown(file_tracing):
+    with tracing.start_span('VICTOR request', kind='server', agent__company_id='42'):
+        with tracing.start_span('victor.plan'):
+            pass
+    provider = tracing._provider
+
+    tracing.shutdown_tracing()
+
+    spans = [json.loads(line) for line in file_tracing.read_text(encoding='utf-8').splitlines()]
+    assert [span['name'] for span in spans] == ['victor.plan', 'VICTOR request']
+    assert spans[1]['attributes']['agent.company_id'] == '42'
+    assert trace.get_tracer_provider() is provider
+    with tracing.start_span('after shutdown') as span:
+        assert span is None
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+from agent_framework import BaseChatClient, ChatResponseUpdate
+
+from domain.agent.contracts.action_plan import ActionStep
+from domain.agent.contracts.action_plan_stream import ActionPlanStreamParser
+from victor_agent import handler as victor_handler
+
+
+PLAN = {
+    'summary': 'Contain the compromised host',
+    'steps': [
+        {'id': 'step-1', 'tool': 'host.isolate', 'description': 'Isolate host-12', 'parameters': '{"host": "host-12"}'},
+        {'id': 'step-2', 'tool': 'ticket.note', 'description': 'Add operator note', 'parameters': '{"note": "isolated"}'}
+    ]
+}
+
+
+class FakeStreamingChatClient(BaseChatClient):
+    """Streams a canned reply in small chunks and records what it was sent."""
+
+    def __init__(self, reply: str, error: Exception | None = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.reply = reply
+        self.error = error
+        self.calls: list[dict] = []
+
+    async def _inner_get_response(self, *, messages, options, **kwargs):
+        raise AssertionError('VICTOR plans must be streamed')
+
+    async def _inner_get_streaming_response(self, *, messages, options, **kwargs):
+        self.calls.append({'messages': list(messages), 'options': dict(options)})
+        for index in range(0, len(self.reply), 7):
+            yield ChatResponseUpdate(role='assistant', text=self.reply[index:index + 7])
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def patches(monkeypatch):
+    recorded: list[dict] = []
+
+    def fake_ticket_patch(backend_client, ticket_id, company_id, patch, auth_header):
+        recorded.append(patch)
+        return {'id': ticket_id, **patch}
+
+    monkeypatch.setattr(victor_handler, 'ticket_patch', fake_ticket_patch)
+    return recorded
+
+
+def _plan(client):
+    agent = client.as_agent(name='VICTOR', instructions=victor_handler._INSTRUCTIONS)
+    return asyncio.run(victor_handler.plan_ticket(
+        None,
+        company_id='acme',
+        ticket_id=7,
+        ticket={'id': 7, 'subject': 'Malware on host-12', 'status': 'PENDING'},
+        auth_header='Bearer token',
+        agent=agent,
+        message='Isolate the host first',
+        thread_id='thread-7'
+    ))
+
+
+def test_streamed_plan_reaches_model_and_is_preapproved(patches):
+    client = FakeStreamingChatClient(json.dumps(PLAN))
+
+    plan, updated_ticket, thread_id = _plan(client)
+
+    options = client.calls[0]['options']
+    assert options['response_format']['json_schema']['strict'] is True
+    prompt = client.calls[0]['messages'][-1].text
+    assert 'Malware on host-12' in prompt and 'Isolate the host first' in prompt
+    assert [step.parameters for step in plan.steps] == [{'host': 'host-12'}, {'note': 'isolated'}]
+    assert plan.metadata == {'generation': 'complete'}
+    assert patches[0]['action_plan']['metadata']['generation'] == 'in_progress'
+    assert 'status' not in patches[0]
+    assert patches[-1]['status'] == 'PREAPROBADO'
+    assert updated_ticket['status'] == 'PREAPROBADO'
+    assert thread_id == 'thread-7'
+
+
+def test_partial_plan_keeps_ticket_status(patches):
+    reply = json.dumps(PLAN)
+    truncated = reply[:reply.index('step-2') + 10]
+    client = FakeStreamingChatClient(truncated, error=ConnectionError('stream reset'))
+
+    plan, _, _ = _plan(client)
+
+    assert [step.step_id for step in plan.steps] == ['step-1']
+    assert plan.metadata['generation'] == 'partial'
+    assert all('status' not in patch for patch in patches)
+
+
+@pytest.mark.parametrize('parameters', [None, [], 'not json'])
+def test_action_step_from_dict_requires_parameters_object(parameters):
+    data = {'id': 'step-1', 'tool': 'ticket.note', 'description': 'Add note'}
+    if parameters is not None:
+        data['parameters'] = parameters
+    with pytest.raises(ValueError):
+        ActionStep.from_dict(data)
+
+
+@pytest.mark.parametrize('steps, errors', [
+    ('[1, STEP]', 1),
+    ('["step-0", STEP, true, [STEP], null]', 4),
+    ('[STEP, -2.5e3]', 1)
+])
+def test_non_object_steps_make_the_plan_partial(steps, errors):
+    step = json.dumps(PLAN['steps'][0])
+    parser = ActionPlanStreamParser()
+
+    parser.feed('{"summary": "s", "steps": ' + steps.replace('STEP', step) + '}')
+    plan = parser.to_plan(7, 'default')
+
+    assert parser.complete
+    assert [item.step_id for item in plan.steps] == ['step-1']
+    assert plan.metadata['generation'] == 'partial'
+    assert plan.metadata['errors'] == ['invalid step: step must be a JSON object'] * errors
+
+
+def test_valid_stream_is_complete():
+    parser = ActionPlanStreamParser()
+
+    for index in range(0, len(json.dumps(PLAN)), 5):
+        parser.feed(json.dumps(PLAN)[index:index + 5])
+
+    assert parser.to_plan(7, 'default').metadata == {'generation': 'complete'}
+
+
+def test_agent_without_run_stream_is_rejected():
+    class PlainAgent:
+        async def run(self, message, thread=None):
+            return 'not constrained'
+
+    async def consume():
+        return [update async for update in victor_handler._stream_agent(PlainAgent(), 'prompt', None, {})]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
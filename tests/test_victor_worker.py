@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+
+import azure.functions as func
+import pytest
+
+import function_app
+from shared.events import build_ticket_created_event, parse_ticket_event
+from victor_agent import handler as victor_handler
+from victor_agent import worker
+
+
+class FakeBackend:
+    def __init__(self, tickets, delay=0.0, error=None):
+        self.tickets = tickets
+        self.delay = delay
+        self.error = error
+        self.gets = []
+        self.patches = []
+
+    def ticket_get(self, backend_client, ticket_id, company_id, auth_header):
+        self.gets.append(ticket_id)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return dict(self.tickets[ticket_id])
+
+    def ticket_patch(self, backend_client, ticket_id, company_id, patch, auth_header):
+        self.patches.append((ticket_id, patch))
+        self.tickets[ticket_id].update(patch)
+        return dict(self.tickets[ticket_id])
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = FakeBackend({})
+    monkeypatch.setattr(worker, 'BackendClient', lambda timeout=None: object())
+    monkeypatch.setattr(worker, 'get_agent_token', lambda company_id, agent_type: 'token')
+    monkeypatch.setattr(worker, 'ticket_get', lambda *args, **kwargs: fake.ticket_get(*args, **kwargs))
+    monkeypatch.setattr(victor_handler, 'ticket_patch', fake.ticket_patch)
+    monkeypatch.setattr(worker, '_semaphore', None)
+    worker._recent_events.clear()
+    worker._tickets_in_flight.clear()
+    return fake
+
+
+def _event(ticket_id=7):
+    return build_ticket_created_event('acme', ticket_id, 'AUTOMATED', 'thread-1')
+
+
+def test_pending_ticket_is_planned_and_preapproved(backend):
+    backend.tickets[7] = {'id': 7, 'status': 'PENDING'}
+
+    result = asyncio.run(worker.process_ticket_event(_event()))
+
+    assert result['outcome'] == 'planned'
+    assert backend.tickets[7]['status'] == 'PREAPROBADO'
+    assert backend.tickets[7]['action_plan']['steps']
+
+
+def test_redelivered_event_is_a_duplicate(backend):
+    backend.tickets[7] = {'id': 7, 'status': 'PENDING'}
+    event = _event()
+
+    asyncio.run(worker.process_ticket_event(event))
+    result = asyncio.run(worker.process_ticket_event(event))
+
+    assert result['outcome'] == 'duplicate'
+    assert backend.gets == [7]
+
+
+@pytest.mark.parametrize('ticket', [
+    {'id': 7, 'status': 'PREAPROBADO'},
+    {'id': 7, 'status': 'PENDING', 'action_plan': {'steps': [], 'metadata': {'generation': 'partial'}}}
+])
+def test_planned_or_moved_tickets_are_skipped(backend, ticket):
+    backend.tickets[7] = ticket
+
+    result = asyncio.run(worker.process_ticket_event(_event()))
+
+    assert result['outcome'] == 'skipped'
+    assert backend.patches == []
+
+
+def test_interrupted_in_progress_plan_is_redone(backend):
+    backend.tickets[7] = {
+        'id': 7,
+        'status': 'PENDING',
+        'action_plan': {'steps': [], 'metadata': {'generation': 'in_progress'}}
+    }
+
+    result = asyncio.run(worker.process_ticket_event(_event()))
+
+    assert result['outcome'] == 'planned'
+    assert backend.tickets[7]['status'] == 'PREAPROBADO'
+
+
+def test_backend_error_propagates_and_releases_the_event(backend):
+    backend.tickets[7] = {'id': 7, 'status': 'PENDING'}
+    backend.error = ConnectionError('backend down')
+    event = _event()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(worker.process_ticket_event(event))
+
+    backend.error = None
+    assert asyncio.run(worker.process_ticket_event(event))['outcome'] == 'planned'
+
+
+def test_concurrent_deliveries_plan_the_ticket_once(backend):
+    backend.tickets[7] = {'id': 7, 'status': 'PENDING'}
+    backend.delay = 0.05
+    event = _event()
+
+    async def deliver():
+        return await asyncio.gather(
+            worker.process_ticket_event(event),
+            worker.process_ticket_event(dict(event)),
+            worker.process_ticket_event(_event())
+        )
+
+    outcomes = sorted(result['outcome'] for result in asyncio.run(deliver()))
+
+    assert outcomes == ['duplicate', 'duplicate', 'planned']
+    assert len([patch for _, patch in backend.patches if patch.get('status') == 'PREAPROBADO']) == 1
+
+
+def test_parse_ticket_event_round_trips_a_valid_event():
+    event = _event()
+
+    assert parse_ticket_event(json.dumps(event).encode('utf-8')) == event
+
+
+@pytest.mark.parametrize('body', [
+    'not json',
+    '[1, 2]',
+    json.dumps({**_event(), 'type': 'ticket.closed'}),
+    json.dumps({**_event(), 'event_id': ''}),
+    json.dumps({**_event(), 'company_id': 42}),
+    json.dumps({**_event(), 'ticket_id': True}),
+    json.dumps({**_event(), 'ticket_id': '7'})
+])
+def test_parse_ticket_event_rejects_malformed_events(body):
+    with pytest.raises(ValueError):
+        parse_ticket_event(body)
+
+
+def test_queue_trigger_dead_letters_malformed_events(monkeypatch):
+    dead_letters = []
+    monkeypatch.setattr(function_app, 'send_to_dead_letter', lambda body, reason: dead_letters.append((body, reason)))
+    monkeypatch.setattr(function_app, 'process_ticket_event', None)
+    trigger = function_app.victor_ticket_created_worker._function.get_user_function()
+
+    asyncio.run(trigger(func.QueueMessage(body=b'{"type": "ticket.created"}')))
+
+    assert dead_letters == [('{"type": "ticket.created"}', 'event_id must be a non-empty string')]
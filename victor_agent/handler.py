@@ -1,8 +1,10 @@
 """Victor durable agent Azure Function (v0)."""
 
+import asyncio
 import json
 import logging
 import os
+import time
 import traceback
 import azure.functions as func
 
@@ -13,10 +15,15 @@ except Exception as exc:
     logging.getLogger(__name__).error('Traceback: %s', traceback.format_exc())
     raise
 from shared.agent_auth import get_agent_token
+from shared.agent_clients import RuleBasedAgentChatClient, get_agent_thread
 from shared.backend_client import BackendClient
-from shared.config import get_company_header_name
+from shared.concurrency import release, try_acquire
+from shared.config import for_company, get_company_header_name, get_plan_patch_interval_seconds, get_settings
 from shared.imports import ensure_repo_root_on_path
+from shared.metrics import record_agent_latency
+from shared.profiling import profile_request
 from shared.tools import ticket_get, ticket_patch
+from shared.tracing import continue_trace, set_attributes, start_span
 
 
 logger = logging.getLogger(__name__)
@@ -28,24 +35,74 @@ if not logger.handlers:
 logger.setLevel(logging.DEBUG)
 
 
-def _build_agent():
+_INSTRUCTIONS = 'You are VICTOR, a ticket execution agent.'
+
+
+def _build_agent(deployment_name: str | None):
     client = AzureOpenAIChatClient(
         endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
         api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-        deployment_name=os.getenv('AZURE_OPENAI_DEPLOYMENT'),
+        deployment_name=deployment_name,
         api_version=os.getenv('AZURE_OPENAI_API_VERSION')
     )
     return client.as_agent(
         name='VICTOR',
-        instructions='You are VICTOR, a ticket execution agent.'
+        instructions=_INSTRUCTIONS
     )
 
 
-victor_agent = _build_agent()
+# One agent per LLM deployment so companies can be routed to their own deployment.
+_agents_by_deployment: dict[str | None, object] = {}
+
+
+def get_agent(deployment_name: str | None):
+    agent = _agents_by_deployment.get(deployment_name)
+    if agent is None:
+        agent = _build_agent(deployment_name)
+        _agents_by_deployment[deployment_name] = agent
+    return agent
+
+
+_rules_agent = None
+
+
+def _get_rules_agent():
+    global _rules_agent
+
+    if _rules_agent is None:
+        _rules_agent = RuleBasedAgentChatClient('VICTOR').as_agent(name='VICTOR', instructions=_INSTRUCTIONS)
+    return _rules_agent
+
+
+# The LLM client is only built at import when the deployment default needs it.
+if get_settings().chat_mode == 'rules':
+    victor_agent = _get_rules_agent()
+else:
+    victor_agent = get_agent(get_settings().llm_deployment)
 app = AgentFunctionApp(agents=[victor_agent])
 
 
 async def main(req: func.HttpRequest) -> func.HttpResponse:
+    company_id = req.headers.get(get_company_header_name())
+    if company_id and not try_acquire(company_id, for_company(company_id).max_concurrent_requests):
+        logger.warning('Concurrency limit reached for company %s', company_id)
+        return func.HttpResponse(
+            json.dumps({'error': 'Too many concurrent requests for company'}),
+            status_code=429,
+            mimetype='application/json'
+        )
+    try:
+        with continue_trace(req.headers), start_span('VICTOR request', kind='server', agent__company_id=company_id):
+            async with profile_request(req, 'VICTOR') as profile:
+                response = await _handle(req, profile)
+            set_attributes(http__response__status_code=response.status_code)
+            return response
+    finally:
+        if company_id:
+            release(company_id)
+
+
+async def _handle(req: func.HttpRequest, profile) -> func.HttpResponse:
     logger.info('VICTOR request received')
     try:
         company_header = get_company_header_name()
@@ -62,6 +119,7 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400,
                 mimetype='application/json'
             )
+        tenant = for_company(company_id)
 
         raw_body = ''
         try:
@@ -78,7 +136,6 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
             logger.debug('Request body is not JSON; defaulting to empty payload')
 
         ensure_repo_root_on_path()
-        from domain.agent.contracts.action_plan import ActionPlan, ActionStep
         from domain.agent.contracts.agent_outputs import AgentOutput
 
         thread_id = req.params.get('thread_id') or payload.get('thread_id') or payload.get('threadId')
@@ -101,13 +158,26 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype='application/json'
             )
 
-        logger.info('Running agent')
-        agent_result = await _run_agent(victor_agent, message or f'ticket_id={ticket_id}', thread_id)
-        logger.debug('Agent result keys: %s', list(agent_result.keys()))
-        resolved_thread_id = agent_result.get('thread_id') or thread_id
+        set_attributes(agent__ticket_id=int(ticket_id))
+
+        # In rules and hybrid modes the plan comes from _build_action_plan, so
+        # hybrid always has a high-confidence rule answer. In llm mode the
+        # streamed plan is the model reply, so no second LLM round trip is made.
+        chat_mode = tenant.chat_mode if tenant.chat_mode != 'hybrid' else 'hybrid/rules'
+        use_rules = tenant.chat_mode in ('rules', 'hybrid')
+
+        resolved_thread_id = thread_id
+        if use_rules:
+            logger.info('Running agent (chat mode %s)', chat_mode)
+            started = time.perf_counter()
+            with start_span('victor.agent_run', kind='client', agent__chat_mode=chat_mode):
+                agent_result = await _run_agent(_get_rules_agent(), message or f'ticket_id={ticket_id}', thread_id)
+            record_agent_latency('VICTOR', chat_mode, time.perf_counter() - started)
+            logger.debug('Agent result keys: %s', list(agent_result.keys()))
+            resolved_thread_id = agent_result.get('thread_id') or thread_id
 
         try:
-            backend_client = BackendClient()
+            backend_client = BackendClient(timeout=tenant.backend_timeout)
         except Exception as exc:
             logger.error('Backend configuration error: %s', exc)
             return func.HttpResponse(
@@ -118,34 +188,53 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=500,
                 mimetype='application/json'
             )
-        agent_token = get_agent_token(company_id, 'VICTOR')
-        agent_auth_header = f'Bearer {agent_token}'
-        logger.info('Fetching ticket %s from backend', ticket_id)
-        ticket = ticket_get(backend_client, ticket_id=int(ticket_id), company_id=company_id, auth_header=agent_auth_header)
-
-        logger.info('Building action plan')
-        action_plan = _build_action_plan(ticket, ActionPlan, ActionStep)
-
-        patch_payload = {
-            'status': 'PREAPROBADO',
-            'action_plan': action_plan.to_dict()
-        }
-        logger.info('Patching ticket %s to PREAPROBADO', ticket_id)
-        updated_ticket = ticket_patch(
-            backend_client,
-            ticket_id=int(ticket_id),
-            company_id=company_id,
-            patch=patch_payload,
-            auth_header=agent_auth_header
-        )
+        with start_span('victor.ticket_get'):
+            agent_token = await asyncio.to_thread(get_agent_token, company_id, 'VICTOR')
+            agent_auth_header = f'Bearer {agent_token}'
+            logger.info('Fetching ticket %s from backend', ticket_id)
+            # A hedged read waits on its threshold, so it must not run on the event loop.
+            ticket = await asyncio.to_thread(
+                ticket_get, backend_client, ticket_id=int(ticket_id), company_id=company_id, auth_header=agent_auth_header
+            )
 
-        response_text = 'Plan generado y ticket marcado como PREAPROBADO.'
+        if use_rules:
+            action_plan, updated_ticket, _ = await plan_ticket(
+                backend_client,
+                company_id=company_id,
+                ticket_id=int(ticket_id),
+                ticket=ticket,
+                auth_header=agent_auth_header
+            )
+        else:
+            logger.info('Streaming action plan (chat mode %s)', chat_mode)
+            started = time.perf_counter()
+            with start_span('victor.agent_run', kind='client', agent__chat_mode=chat_mode):
+                action_plan, updated_ticket, stream_thread_id = await plan_ticket(
+                    backend_client,
+                    company_id=company_id,
+                    ticket_id=int(ticket_id),
+                    ticket=ticket,
+                    auth_header=agent_auth_header,
+                    agent=get_agent(tenant.llm_deployment),
+                    message=message,
+                    thread_id=thread_id
+                )
+            record_agent_latency('VICTOR', chat_mode, time.perf_counter() - started)
+            resolved_thread_id = stream_thread_id or thread_id
+        if profile:
+            profile.thread_id = resolved_thread_id
+        set_attributes(agent__thread_id=resolved_thread_id, agent__chat_mode=chat_mode)
+
+        if action_plan.metadata.get('generation') == 'partial':
+            response_text = 'Plan parcial guardado; el ticket requiere revision antes de PREAPROBADO.'
+        else:
+            response_text = 'Plan generado y ticket marcado como PREAPROBADO.'
 
         output = AgentOutput(
             text=response_text,
             thread_id=resolved_thread_id,
             action_plan=action_plan,
-            metadata={'ticket': updated_ticket}
+            metadata={'ticket': updated_ticket, 'chat_mode': chat_mode}
         )
 
         logger.info('Returning response')
@@ -176,6 +265,149 @@ def _parse_ticket_id(message: str) -> int | None:
     return None
 
 
+async def plan_ticket(
+    backend_client: BackendClient,
+    company_id: str,
+    ticket_id: int,
+    ticket: dict,
+    auth_header: str,
+    agent=None,
+    message: str = '',
+    thread_id: str | None = None
+):
+    """Build the action plan for ``ticket`` and patch it to PREAPROBADO.
+
+    Without ``agent`` the deterministic plan is used. With an LLM agent the
+    plan is streamed and persisted progressively (see _stream_action_plan);
+    a ``partial`` plan is saved without changing the ticket status so it is
+    not pre-approved. Returns the plan, the updated ticket and the thread id.
+    """
+    ensure_repo_root_on_path()
+    from domain.agent.contracts.action_plan import ActionPlan, ActionStep
+
+    resolved_thread_id = thread_id
+    logger.info('Building action plan')
+    with start_span('victor.plan', agent__ticket_id=ticket_id):
+        if agent is None:
+            action_plan = _build_action_plan(ticket, ActionPlan, ActionStep)
+        else:
+            action_plan, resolved_thread_id = await _stream_action_plan(
+                backend_client, company_id, ticket_id, ticket, auth_header, agent, message, thread_id
+            )
+
+    patch_payload: dict = {'action_plan': action_plan.to_dict()}
+    if action_plan.metadata.get('generation') == 'partial':
+        logger.warning('Plan for ticket %s is partial; leaving status unchanged', ticket_id)
+    else:
+        patch_payload['status'] = 'PREAPROBADO'
+        logger.info('Patching ticket %s to PREAPROBADO', ticket_id)
+    with start_span('victor.ticket_patch', agent__ticket_id=ticket_id):
+        updated_ticket = await asyncio.to_thread(
+            ticket_patch,
+            backend_client,
+            ticket_id=ticket_id,
+            company_id=company_id,
+            patch=patch_payload,
+            auth_header=auth_header
+        )
+    return action_plan, updated_ticket, resolved_thread_id
+
+
+async def _stream_action_plan(
+    backend_client: BackendClient,
+    company_id: str,
+    ticket_id: int,
+    ticket: dict,
+    auth_header: str,
+    agent,
+    message: str,
+    thread_id: str | None
+):
+    """Stream a schema-constrained plan and persist steps as they are parsed.
+
+    The first patch is sent right after step one, later ones at most every
+    VICTOR_PLAN_PATCH_INTERVAL_SECONDS; the status is left untouched until
+    the final patch. A stream that fails after producing steps yields a
+    ``partial`` plan instead of an error.
+    """
+    from domain.agent.contracts.action_plan import ACTION_PLAN_JSON_SCHEMA
+    from domain.agent.contracts.action_plan_stream import ActionPlanStreamParser
+
+    parser = ActionPlanStreamParser()
+    response_format = {
+        'type': 'json_schema',
+        'json_schema': {'name': 'ActionPlan', 'schema': ACTION_PLAN_JSON_SCHEMA, 'strict': True}
+    }
+    prompt = _build_plan_prompt(ticket, message, ACTION_PLAN_JSON_SCHEMA)
+    interval = get_plan_patch_interval_seconds()
+    last_patch_at: float | None = None
+    resolved_thread_id = thread_id
+
+    try:
+        async for update in _stream_agent(agent, prompt, thread_id, response_format):
+            text, update_thread_id = _update_text(update)
+            resolved_thread_id = update_thread_id or resolved_thread_id
+            if not parser.feed(text):
+                continue
+            now = time.monotonic()
+            if last_patch_at is not None and now - last_patch_at < interval:
+                continue
+            partial_plan = parser.to_plan(ticket_id, 'Generating action plan', in_progress=True)
+            logger.info('Persisting %s plan steps for ticket %s', len(partial_plan.steps), ticket_id)
+            await asyncio.to_thread(
+                ticket_patch,
+                backend_client,
+                ticket_id=ticket_id,
+                company_id=company_id,
+                patch={'action_plan': partial_plan.to_dict()},
+                auth_header=auth_header
+            )
+            last_patch_at = now
+    except Exception as exc:
+        if not parser.steps:
+            raise
+        logger.warning('Plan stream for ticket %s failed after %s steps: %s', ticket_id, len(parser.steps), exc)
+        parser.errors.append(f'stream failed: {exc}')
+
+    if not parser.steps:
+        raise ValueError('LLM did not return any valid action step')
+    return parser.to_plan(ticket_id, 'Action plan generated by VICTOR'), resolved_thread_id
+
+
+def _build_plan_prompt(ticket: dict, message: str, schema: dict) -> str:
+    ticket_fields = {key: ticket.get(key) for key in ('id', 'subject', 'description', 'status') if key in ticket}
+    prompt = (
+        'Create an action plan for the ticket below. Reply ONLY with a JSON object that matches this '
+        'JSON schema, writing "summary" before "steps":\n'
+        f'{json.dumps(schema)}\n\nTicket:\n{json.dumps(ticket_fields, default=str)}'
+    )
+    if message:
+        prompt += f'\n\nOperator instructions: {message}'
+    return prompt
+
+
+async def _stream_agent(agent, message: str, thread_id: str | None, response_format: dict):
+    if hasattr(agent, 'run_stream'):
+        stream = agent.run_stream(
+            message,
+            thread=get_agent_thread(agent, thread_id),
+            options={'response_format': response_format}
+        )
+        async for update in stream:
+            yield update
+    else:
+        # A plain run cannot carry response_format, so the schema would be dropped.
+        raise RuntimeError('Agent does not expose run_stream; cannot request a schema-constrained plan')
+
+
+def _update_text(update) -> tuple[str, str | None]:
+    if isinstance(update, dict):
+        return str(update.get('text') or ''), update.get('thread_id')
+    if isinstance(update, str):
+        return update, None
+    return str(getattr(update, 'text', None) or ''), getattr(update, 'thread_id', None)
+
+
 def _build_action_plan(ticket: dict, plan_class, step_class):
     steps = (
         step_class(
@@ -200,9 +432,9 @@ def _build_action_plan(ticket: dict, plan_class, step_class):
 
 async def _run_agent(agent, message: str, thread_id: str | None) -> dict:
     if hasattr(agent, 'run'):
-        result = await agent.run(message=message, thread_id=thread_id)
+        result = await agent.run(message, thread=get_agent_thread(agent, thread_id))
     elif hasattr(agent, 'chat'):
-        result = await agent.chat(message=message, thread_id=thread_id)
+        result = await agent.chat(message, thread=get_agent_thread(agent, thread_id))
     else:
         raise RuntimeError('ChatAgent does not expose a run/chat method')
 
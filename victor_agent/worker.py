@@ -0,0 +1,124 @@
+"""Queue-triggered VICTOR worker that pre-computes plans for PENDING tickets."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from shared.agent_auth import get_agent_token
+from shared.backend_client import BackendClient
+from shared.config import for_company, get_worker_concurrency
+from shared.tools import ticket_get
+from shared.tracing import continue_trace, set_attributes, start_span
+
+from .handler import get_agent, plan_ticket
+
+
+logger = logging.getLogger(__name__)
+
+_RECENT_EVENTS_MAX = 1024
+
+# Event ids reserved ('processing') or already handled by this instance, and
+# the tickets being planned right now; the ticket state in the backend remains
+# the authoritative idempotency check across instances.
+_recent_events: OrderedDict[str, str] = OrderedDict()
+_tickets_in_flight: set[tuple[str, int]] = set()
+_recent_events_lock = threading.Lock()
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def process_ticket_event(event: dict) -> dict:
+    """Attach an action plan to the ticket referenced by a ``ticket.created`` event.
+
+    Redelivered events and tickets that already have a plan or have left
+    PENDING are skipped, so reprocessing is safe. The event id and ticket are
+    reserved before any backend call, so concurrent deliveries of the same
+    event or ticket plan it once. Backend errors release the reservation and
+    propagate so the host retries the message and eventually dead-letters it.
+    """
+    event_id = event['event_id']
+    ticket_key = (event['company_id'], event['ticket_id'])
+    with _recent_events_lock:
+        previous = _recent_events.get(event_id)
+        if previous is None and ticket_key in _tickets_in_flight:
+            previous = 'ticket in flight'
+        if previous is None:
+            _recent_events[event_id] = 'processing'
+            _tickets_in_flight.add(ticket_key)
+    if previous is not None:
+        logger.info('Event %s already processed (%s); skipping', event_id, previous)
+        return {'event_id': event_id, 'ticket_id': event['ticket_id'], 'outcome': 'duplicate'}
+
+    try:
+        outcome = await _trace_and_process(event)
+    except BaseException:
+        with _recent_events_lock:
+            _recent_events.pop(event_id, None)
+        raise
+    finally:
+        with _recent_events_lock:
+            _tickets_in_flight.discard(ticket_key)
+
+    with _recent_events_lock:
+        _recent_events[event_id] = outcome
+        while len(_recent_events) > _RECENT_EVENTS_MAX:
+            _recent_events.popitem(last=False)
+    return {'event_id': event_id, 'ticket_id': event['ticket_id'], 'outcome': outcome}
+
+
+async def _trace_and_process(event: dict) -> str:
+    trace_context = event.get('trace_context') if isinstance(event.get('trace_context'), dict) else None
+    with continue_trace(trace_context), start_span(
+        'VICTOR ticket.created',
+        kind='consumer',
+        agent__company_id=event['company_id'],
+        agent__ticket_id=event['ticket_id'],
+        agent__thread_id=event.get('thread_id'),
+        agent__classification=event.get('classification')
+    ):
+        # Bounds in-flight backend work per instance on top of the host batch size.
+        async with _get_semaphore():
+            outcome = await _process(event)
+        set_attributes(agent__worker_outcome=outcome)
+    return outcome
+
+
+async def _process(event: dict) -> str:
+    company_id = event['company_id']
+    ticket_id = event['ticket_id']
+    tenant = for_company(company_id)
+    backend_client = BackendClient(timeout=tenant.backend_timeout)
+    agent_token = await asyncio.to_thread(get_agent_token, company_id, 'VICTOR')
+    auth_header = f'Bearer {agent_token}'
+
+    logger.info('Fetching ticket %s for event %s', ticket_id, event['event_id'])
+    ticket = await asyncio.to_thread(
+        ticket_get, backend_client, ticket_id=ticket_id, company_id=company_id, auth_header=auth_header
+    )
+    # A plan still marked in_progress was interrupted mid-stream and is redone.
+    existing_plan = ticket.get('action_plan')
+    generation = (existing_plan.get('metadata') or {}).get('generation') if isinstance(existing_plan, dict) else None
+    if ticket.get('status') != 'PENDING' or (existing_plan and generation != 'in_progress'):
+        logger.info('Ticket %s already planned or not PENDING; skipping', ticket_id)
+        return 'skipped'
+
+    await plan_ticket(
+        backend_client,
+        company_id=company_id,
+        ticket_id=ticket_id,
+        ticket=ticket,
+        auth_header=auth_header,
+        agent=get_agent(tenant.llm_deployment) if tenant.chat_mode == 'llm' else None
+    )
+    return 'planned'
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_worker_concurrency())
+    return _semaphore